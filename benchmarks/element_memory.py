@@ -0,0 +1,117 @@
+"""
+Memory per compiled element, for a generated document of many small styled elements.
+
+Besides the whole compiled document, the element tree is rebuilt twice from the compiled one and measured on its
+own: once in the old layout (a __dict__ per element, its own children list and computed styles dict, and a style
+record per element holding every style, defaults included) and once in the current one (slotted elements, shared
+empty mappings, and one record per distinct style holding only the styles that were set).
+
+Run from the repository root:
+    python -m benchmarks.element_memory [elements]
+"""
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+from src.compiler import Compiler, DivElement
+from src.compiler.pmscript import ELEMENTS, DEFAULT_STYLES, StyleRecord, build_style_record
+from src.utils.ids import IdAllocator
+
+
+class LegacyElement:
+    # Element as it was before it was slotted
+    def __init__(self, element, ids:IdAllocator):
+        self.type = element.type
+        self.id = element.id
+        self.parent_id = element.parent_id
+        self.children = []
+        self.computed_styles = {}
+        self.style = dict(element.style)
+        self.style_record = StyleRecord({**DEFAULT_STYLES, **element.style_record.static}, element.style_record.percentages, element.style_record.states)
+        self.surf = None
+        self.surf_rect = None
+        self.raster = None
+        self.raster_key = None
+        self.scoped_styles = element.scoped_styles
+        self.children_allowed = element.children_allowed
+        for key in element.required:
+            setattr(self, key, getattr(element, key))
+        ids.claim(self.id)
+
+
+def legacy_tree(compiled:dict) -> dict:
+    tree = {}
+    ids = IdAllocator()
+    for id_, element in compiled.items(): # parents come before their children
+        if element.type == 'global':
+            continue
+        legacy = tree[id_] = LegacyElement(element, ids)
+        if element.parent_id in tree:
+            tree[element.parent_id].children.append(legacy)
+    return tree
+
+
+def current_tree(compiled:dict) -> dict:
+    tree = {}
+    ids = IdAllocator()
+    records = {}
+    for id_, element in compiled.items():
+        if element.type == 'global':
+            continue
+        extras = {key:getattr(element, key) for key in element.required}
+        current = tree[id_] = ELEMENTS[element.type](element.parent_id, dict(element.style), id_, ids=ids, **extras)
+        key = tuple(element.style.items())
+        if key not in records:
+            records[key] = build_style_record(element.style)[0]
+        current.style_record = records[key]
+        if element.parent_id in tree:
+            tree[element.parent_id].children.append(current)
+    return tree
+
+
+def write_document(path:str, count:int):
+    with open(path, 'w') as f:
+        f.write(">frame id='root' style='width:100%/height:100%'\n")
+        for i in range(count):
+            if i % 2:
+                f.write(f"    >div style='width:{i % 50}/height:20/left:{i % 400}/background:(10,20,30)'\n    >/div\n")
+            else:
+                f.write(f"    >text style='width:40%/font-size:12'\n        label {i}\n    >/text\n")
+        f.write(">/frame\n")
+
+
+def measure(build) -> tuple[int,object]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'generated.pym')
+        write_document(path, count)
+        compiled_bytes, compiler = measure(lambda: Compiler(path, use_cache=False))
+
+    # style strings are shared with the compiled tree in both, so these only count the element layout
+    legacy_bytes, _ = measure(lambda: legacy_tree(compiler.compiled))
+    current_bytes, _ = measure(lambda: current_tree(compiler.compiled))
+
+    style = {'width':'10', 'height':'20'}
+    bare_bytes, _ = measure(lambda: [DivElement('root', dict(style), f'bench{i}') for i in range(count)])
+
+    print(f"compiled document: {compiled_bytes / count:8.1f} bytes/element ({count} elements)")
+    print(f"     element tree: {legacy_bytes / count:8.1f} -> {current_bytes / count:8.1f} bytes/element (old layout -> current)")
+    print(f"     bare element: {bare_bytes / count:8.1f} bytes/element")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Synthetic .pym documents of a controlled shape, for the benchmark suite.
+
+Every generator writes its files into `directory` and returns a Document. Each document binds the height of
+one element to a state, so the suite can time the re-render of a single state change on it.
+Imports are written with absolute paths, since the compiler resolves them against the working directory.
+"""
+import json
+import os
+from typing import NamedTuple
+
+
+class Document(NamedTuple):
+    path:str # root document to compile
+    state:str # state the incremental re-render toggles
+    values:tuple[str,str] # the two values it is toggled between
+
+
+STATE_VALUES = ('10', '30')
+
+
+def _write(directory:str, name:str, lines:list[str]) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+def _probe(indent:str='    ') -> list[str]:
+    # the element the incremental re-render changes
+    return [f"{indent}>div id='probe' style='width:20/height:$$probe/background:(0,255,0)'",
+            f"{indent}>/div"]
+
+
+def deep(directory:str, depth:int) -> Document:
+    """One chain of `depth` divs, each nested in the last and sized off its parent"""
+    lines = [f";$probe < '{STATE_VALUES[0]}'",
+             ">frame id='root' style='width:100%/height:100%'"]
+    for i in range(depth):
+        lines.append(f"{'    ' * (i + 1)}>div style='width:95%/height:95%/top:1/left:1/background:({i % 256},0,0)'")
+    lines.extend(_probe('    ' * (depth + 1)))
+    for i in reversed(range(depth)):
+        lines.append(f"{'    ' * (i + 1)}>/div")
+    lines.append(">/frame")
+    return Document(_write(directory, 'deep.pym', lines), 'probe', STATE_VALUES)
+
+
+def wide(directory:str, count:int) -> Document:
+    """`count` sibling divs and texts under one frame"""
+    lines = [f";$probe < '{STATE_VALUES[0]}'",
+             ">frame id='root' style='width:100%/height:100%'"]
+    for i in range(count):
+        if i % 4:
+            lines.extend([f"    >div style='width:{10 + i % 40}/height:10/top:{i % 400}/left:{(i * 7) % 400}/background:(0,0,{i % 256})'",
+                          "    >/div"])
+        else:
+            lines.extend([f"    >text style='font-size:12/top:{i % 400}'",
+                          f"        label {i}",
+                          "    >/text"])
+    lines.extend(_probe())
+    lines.append(">/frame")
+    return Document(_write(directory, 'wide.pym', lines), 'probe', STATE_VALUES)
+
+
+def imports(directory:str, files:int, per_file:int=10, repeats:int=2) -> Document:
+    """A root that imports `files` distinct documents `repeats` times each, every one holding `per_file` divs"""
+    paths = []
+    for i in range(files):
+        lines = []
+        for j in range(per_file):
+            lines.extend([f">div style='width:10/height:10/left:{j * 12}/top:{i % 400}/background:({i % 256},{j % 256},0)'",
+                          ">/div"])
+        paths.append(_write(directory, f'part{i}.pym', lines))
+
+    lines = [f";$probe < '{STATE_VALUES[0]}'",
+             ">frame id='root' style='width:100%/height:100%'"]
+    for _ in range(repeats):
+        for path in paths:
+            lines.append(f"    ;;markdown < '{path}'")
+    lines.extend(_probe())
+    lines.append(">/frame")
+    return Document(_write(directory, 'imports.pym', lines), 'probe', STATE_VALUES)
+
+
+def states(directory:str, count:int) -> Document:
+    """`count` states, each bound to the size of its own div"""
+    lines = [f";$probe < '{STATE_VALUES[0]}'"]
+    lines.extend(f";$s{i} < '{10 + i % 50}'" for i in range(count))
+    lines.append(">frame id='root' style='width:100%/height:100%'")
+    for i in range(count):
+        lines.extend([f"    >div style='width:$$s{i}/height:$$s{i}/left:{i % 400}/background:(0,{i % 256},0)'",
+                      "    >/div"])
+    lines.extend(_probe())
+    lines.append(">/frame")
+    return Document(_write(directory, 'states.pym', lines), 'probe', STATE_VALUES)
+
+
+def styles(directory:str, classes:int, elements:int=None) -> Document:
+    """A style file of `classes` classes, used round robin by `elements` divs (default: one per class)"""
+    elements = classes if elements is None else elements
+    raw_styles = {f"c{i}":{
+        'width':str(5 + i % 60),
+        'height':str(5 + i % 30),
+        'top':f"{i % 100}%",
+        'left':str(i % 400),
+        'background':f"({i % 256},{(i * 3) % 256},{(i * 7) % 256})",
+        'border-width':str(i % 3),
+        'border-color':"(0,0,0)",
+        'opacity':f"{50 + i % 50}%",
+    } for i in range(classes)}
+    style_path = os.path.join(directory, 'styles.json')
+    with open(style_path, 'w') as f:
+        json.dump(raw_styles, f, indent=4)
+
+    lines = [f";;styles < '{style_path}'",
+             f";$probe < '{STATE_VALUES[0]}'",
+             ">frame id='root' style='width:100%/height:100%'"]
+    for i in range(elements):
+        lines.extend([f"    >div class='c{i % classes}'", "    >/div"])
+    lines.extend(_probe())
+    lines.append(">/frame")
+    return Document(_write(directory, 'styles.pym', lines), 'probe', STATE_VALUES)
+
+
+# shape name -> (generator, size at scale 1)
+SHAPES = {
+    'deep':(deep, 200),
+    'wide':(wide, 2000),
+    'imports':(imports, 100),
+    'states':(states, 1000),
+    'styles':(styles, 2000),
+}
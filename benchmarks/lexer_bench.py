@@ -0,0 +1,189 @@
+"""
+Microbenchmark of the scanner Lexer against the original CharLexer.
+
+Run from the repository root:
+    python -m benchmarks.lexer_bench [lines] [repeats]
+"""
+import os
+import random
+import sys
+import timeit
+from typing import Any
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+from src.compiler.pmscript import Lexer, Token, Element, StringNotEnded, \
+    T_ADVANCE, T_BACK, T_DATAVALUE, T_DOLLAR, T_EQ, T_FSLASH, T_LBRCK, T_NAMEVALUE, T_RBRCK, T_SEMICOLON
+
+
+# The original character by character lexer the compiler used before the scanner. Kept here as the reference
+# the scanner is checked and benchmarked against
+class CharLexer:
+    text:str
+    current_char:str
+    current_build:str
+    mode:list[Any]
+    tokens:list[Token] = []
+    parent:Element
+
+    def __init__(self):
+        ...
+    
+    def new_line(self,line:str, index:int, parent:Element = None):
+        self.text = line.strip()
+        self.parent = parent
+        self.index = index
+        self.current_build = ''
+        self.mode = [self.default_search] # A stack for me to easily switch between different search patterns
+        self.tokens = []
+        if self.text: 
+            self.make_tokens()
+    
+    def make_tokens(self):
+        for i, char in enumerate(self.text):
+            
+            self.mode[-1](char) # The top of the stack is the capture method that is executed
+
+        
+        ####### To clear up any escaped builds #######
+
+        if self.mode[-1] == self.value_search: # This logic is to capture any components at the end of the string
+            raise StringNotEnded(self.index, self.text)
+        
+        elif self.current_build != '':
+            self.tokens.append(Token(T_NAMEVALUE,self.current_build.strip()))
+
+    ##############################################################
+
+    def flush_build(self):
+        if self.current_build != '':
+            self.tokens.append(Token(T_NAMEVALUE,self.current_build.strip()))
+        self.current_build = ''
+
+    def default_search(self,char:str):
+        if char == ' ' or char == '\t':
+            self.flush_build()
+
+        
+        elif char == '\'':
+            self.current_build = ''
+            self.mode.append(self.value_search)
+        
+
+        elif char == '>': # In The future I could probably make this way more concise but for now it works
+            self.flush_build()
+            self.tokens.append(Token(T_ADVANCE,char))
+            
+        
+        elif char == ';':
+            self.flush_build()
+            self.tokens.append(Token(T_SEMICOLON,char))
+
+
+        elif char == '[':
+            self.flush_build()
+            self.tokens.append(Token(T_LBRCK,char))
+
+
+        elif char == ']':
+            self.flush_build()
+            self.tokens.append(Token(T_RBRCK,char))
+
+
+        elif char == '=':
+            self.flush_build()
+            self.tokens.append(Token(T_EQ,char))
+
+
+        elif char == '/':
+            self.flush_build()
+            self.tokens.append(Token(T_FSLASH,char))
+
+        elif char == '<':
+            self.flush_build()
+            self.tokens.append(Token(T_BACK,char))
+
+        elif char == '$':
+            self.flush_build()
+            self.tokens.append(Token(T_DOLLAR,char))
+        else:
+            self.current_build += char
+
+    ##############################################################
+
+    def value_search(self, char:str):
+        if char == '\'':
+            self.tokens.append(Token(T_DATAVALUE,self.current_build.strip()))
+            self.current_build = ''
+            self.mode.pop()
+        # elif char in ILLEGAL_DATA_NAMESPACES:
+        #     raise IllegalCharError(self.index,self.text, char)
+        else:
+            self.current_build += char
+
+
+SAMPLE_LINES = [
+    ">frame id='welcome' style='height:90%/width:50%/background:(255,0,0)/top:5%/left:10%'",
+    "    >div class='abc' style='width:100/height:$$heightState' id='abc'",
+    "        >text id='hi' modifiable='False'",
+    "            $$textState",
+    "        >/text",
+    "        // Maybe I could try to add the double | symbol for newline syntax",
+    ";;markdown < './tests/efgh.pym'",
+    ";$heightState < '100'",
+    "",
+    "            This is a Popup window!",
+]
+FUZZ_ALPHABET = "ab1 \t'>;[]=/<$%:(),"
+
+
+def token_stream(lexer, lines):
+    stream = []
+    for index, line in enumerate(lines):
+        lexer.new_line(line, index+1)
+        stream.append([(tok.type, tok.value) for tok in lexer.tokens])
+    return stream
+
+
+def lex_all(lexer, lines):
+    new_line = lexer.new_line
+    for index, line in enumerate(lines):
+        new_line(line, index+1)
+
+
+def check_equivalence(cases:int=5000, seed:int=0):
+    rand = random.Random(seed)
+    lines = list(SAMPLE_LINES)
+    for _ in range(cases):
+        line = ''.join(rand.choice(FUZZ_ALPHABET) for _ in range(rand.randint(0, 40)))
+        if line.count("'") % 2: # unended strings exit the process, those are checked on their own below
+            line += "'"
+        lines.append(line)
+
+    assert token_stream(Lexer(), lines) == token_stream(CharLexer(), lines), "token streams differ"
+
+    for lexer in (Lexer(), CharLexer()):
+        try:
+            lexer.new_line(">div id='abc", 1)
+        except SystemExit:
+            continue
+        raise AssertionError(f"{type(lexer).__name__} accepted an unended string")
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    lines = (SAMPLE_LINES * (line_count // len(SAMPLE_LINES) + 1))[:line_count]
+
+    check_equivalence()
+
+    results = {}
+    for lexer_type in (CharLexer, Lexer):
+        lexer = lexer_type()
+        best = min(timeit.repeat(lambda: lex_all(lexer, lines), number=1, repeat=repeats))
+        results[lexer_type.__name__] = best
+        print(f"{lexer_type.__name__:>10}: {best*1000:8.2f} ms for {line_count} lines ({best/line_count*1e6:.2f} us/line)")
+    print(f"{'speedup':>10}: {results['CharLexer']/results['Lexer']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
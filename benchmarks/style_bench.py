@@ -0,0 +1,86 @@
+"""
+Per-element style cost: the old render-time validation against the compiled style records.
+
+Run from the repository root:
+    python -m benchmarks.style_bench [elements] [repeats]
+"""
+import os
+import re
+import sys
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import src as pm
+from src.compiler import DivElement, STYLES
+from src.compiler.pmscript import build_style_record
+
+SAMPLE_STYLES = [
+    {'width':'50%', 'height':'20', 'background':'(255,0,0)', 'top':'5%', 'left':'10'},
+    {'width':'100', 'height':'100', 'border-width':'2', 'border-color':'(0,0,0)', 'opacity':'50%'},
+    {'position':'absolute', 'width':'20', 'height':'20', 'top':'40', 'left':'20', 'rotation':'15'},
+]
+
+
+def legacy_validate(view, element):
+    # the style loop create_image_individual ran on every render before styles were compiled
+    buffer = {}
+    for style in STYLES.keys():
+        if style not in element.style:
+            buffer[style] = STYLES[style]['default']
+            continue
+        val = element.style[style].strip()
+        acceptable_types = STYLES[style]['types']
+        not_chosen = 0
+        if "number" in acceptable_types:
+            try:
+                buffer[style] = float(val)
+            except ValueError:
+                not_chosen += 1
+        if "percentage" in acceptable_types:
+            try:
+                maximum = STYLES[style]['max']
+                if maximum in ['parentwidth','parentheight']:
+                    if buffer['position'] == 'relative':
+                        parent = view.getElementById(element.parent_id)
+                    else:
+                        parent = view.getElementById('global')
+                    if maximum == 'parentwidth':
+                        maximum = parent.computed_styles['width']
+                    elif maximum == 'parentheight':
+                        maximum = parent.computed_styles['height']
+                buffer[style] = (float(val[:-1]) / 100) * maximum
+            except ValueError:
+                not_chosen += 1
+        if "rgbvalue" in acceptable_types:
+            if len(re.findall(r"(\d+)",val)) != 3:
+                not_chosen += 1
+            else:
+                buffer[style] = tuple(map(int,re.findall(r"(\d+)",val)))
+        if "text" in acceptable_types:
+            if val not in STYLES[style]['accepted']:
+                not_chosen += 1
+            else:
+                buffer[style] = val
+    return buffer
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    view = pm.initialize('./tests/abcd.pym', [400,400])
+    elements = []
+    for i in range(count):
+        element = DivElement('welcome', dict(SAMPLE_STYLES[i % len(SAMPLE_STYLES)]), f'bench{i}')
+        element.style_record = build_style_record(element.style)[0]
+        elements.append(element)
+
+    legacy = min(timeit.repeat(lambda: [legacy_validate(view, e) for e in elements], number=1, repeat=repeats))
+    compiled = min(timeit.repeat(lambda: [view.resolve_styles(e) for e in elements], number=1, repeat=repeats))
+    print(f"  per-render validation: {legacy/count*1e6:7.2f} us/element")
+    print(f"compiled style records: {compiled/count*1e6:7.2f} us/element")
+    print(f"               speedup: {legacy/compiled:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
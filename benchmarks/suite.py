@@ -0,0 +1,154 @@
+"""
+Headless benchmark suite over generated documents (see benchmarks/generators.py).
+
+For every shape it measures the compile time, the first render (building the View), the re-render after one
+state change, and the memory of a compile plus first render: the peak of the python heap (tracemalloc) plus the
+pixels of every surface the View holds afterwards, which SDL allocates outside of tracemalloc's sight.
+Results are written as JSON so runs from different releases can be compared.
+
+Run from the repository root:
+    python -m benchmarks.suite [--scale 1.0] [--repeats 5] [--output results.json] [shape ...]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame as pg
+from src.compiler import Compiler
+from src.main.main import View
+from src.utils.cache import surface_bytes
+from benchmarks.generators import SHAPES, Document
+
+SIZE = [800, 600]
+
+
+def build_view(compiler:Compiler) -> View:
+    return View(compiler.compiled, compiler.states, SIZE, compiler.frames, compiler.state_dependencies)
+
+
+def timings(samples:list[float]) -> dict:
+    return {
+        'min_ms':min(samples) * 1000,
+        'median_ms':statistics.median(samples) * 1000,
+        'max_ms':max(samples) * 1000,
+        'samples':len(samples),
+    }
+
+
+def view_surface_bytes(view:View) -> int:
+    # the screen, the frame layers and every element's surfaces, each shared surface counted once
+    surfaces = {id(view.surf):view.surf}
+    surfaces.update((id(layer), layer) for layer in view.layers.values())
+    for element in view.elements.values():
+        for surf in (element.surf, element.raster):
+            if surf is not None:
+                surfaces[id(surf)] = surf
+    return sum(surface_bytes(surf) for surf in surfaces.values())
+
+
+def measure_memory(document:Document) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    compiler = Compiler(document.path, use_cache=False)
+    view = build_view(compiler)
+    heap_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    surfaces = view_surface_bytes(view)
+    return {
+        'peak_memory_bytes':heap_peak + surfaces,
+        'python_heap_peak_bytes':heap_peak,
+        'surface_bytes':surfaces,
+    }
+
+
+def run_shape(document:Document, repeats:int) -> dict:
+    compile_samples = []
+    render_samples = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        compiler = Compiler(document.path, use_cache=False)
+        compile_samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        view = build_view(compiler)
+        render_samples.append(time.perf_counter() - start)
+
+    # the last view stays up for the incremental renders. The state starts at values[0], so the first set
+    # already has to change it or State.set skips it and the sample times nothing
+    state = view.states[document.state]
+    incremental_samples = []
+    for i in range(max(repeats * 4, 20)):
+        frames = view.render_stats.frames
+        start = time.perf_counter()
+        state.set(document.values[(i + 1) % 2])
+        incremental_samples.append(time.perf_counter() - start)
+        assert view.render_stats.frames > frames, f"setting ${document.state} did not re-render"
+
+    return {
+        'elements':len(compiler.compiled),
+        'compile':timings(compile_samples),
+        'first_render':timings(render_samples),
+        'incremental_render':timings(incremental_samples),
+        **measure_memory(document),
+        'phases':view.stats()['render']['phases'],
+    }
+
+
+def main(argv:list[str]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('shapes', nargs='*', help=f"shapes to run, out of {', '.join(SHAPES)} (default: all)")
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies the size of every document')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', metavar='FILE', help='write the results to FILE instead of stdout')
+    args = parser.parse_args(argv)
+
+    shapes = args.shapes or list(SHAPES)
+    unknown = [name for name in shapes if name not in SHAPES]
+    if unknown:
+        parser.error(f"unknown shapes: {', '.join(unknown)}")
+    results = {
+        'meta':{
+            'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':platform.python_version(),
+            'pygame':pg.version.ver,
+            'platform':platform.platform(),
+            'scale':args.scale,
+            'repeats':args.repeats,
+        },
+        'shapes':{},
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name in shapes:
+            generator, size = SHAPES[name]
+            size = max(1, int(size * args.scale))
+            shape_directory = os.path.join(directory, name)
+            os.mkdir(shape_directory)
+            document = generator(shape_directory, size)
+            result = run_shape(document, args.repeats)
+            result['size'] = size
+            results['shapes'][name] = result
+            print(f"{name:>8}: compile {result['compile']['median_ms']:8.2f}ms"
+                  f"  first render {result['first_render']['median_ms']:8.2f}ms"
+                  f"  re-render {result['incremental_render']['median_ms']:6.3f}ms"
+                  f"  peak {result['peak_memory_bytes'] / 1024 / 1024:7.2f}MiB", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
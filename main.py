@@ -1,21 +1,28 @@
 import src as pm
 import sys,pygame as pg
 from pygame.locals import *
-View = pm.initialize('./tests/abcd.pym', [400,400])
+View = pm.initialize('./tests/abcd.pym', [400,400], watch=True)
 pg.init()
 clock = pg.Clock()
 display= pg.display.set_mode((400,400),pg.SRCALPHA)
+display.blit(View.surf,(0,0))
+pg.display.flip()
+View.pop_dirty_rects()
 
 
 
 while True:
-    display.fill((0,0,0))
     for event in pg.event.get():
         if event.type == QUIT:
             pg.quit()
             sys.exit()
 
-    display.blit(View.surf,(0,0))
-    pg.display.flip()
+    View.watcher.poll() # picks up edits to the document while running
+    # only present what the view actually changed, idle frames skip presenting altogether
+    rects = View.pop_dirty_rects()
+    if rects:
+        for rect in rects:
+            display.blit(View.surf,rect,rect)
+        pg.display.update(rects)
     clock.tick(24)
     
\ No newline at end of file
@@ -2,4 +2,5 @@ from .pmscript import \
     Compiler, Element, \
     DivElement, TextElement, \
     FrameElement, ImageElement, \
-    State, STYLES
\ No newline at end of file
+    State, STYLES
+from .batch import compile_many, CompileResult
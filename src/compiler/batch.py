@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from .pmscript import Compiler
+from . import cache
+from ..utils.logging import FatalError, flush_log, recoverable
+
+##################
+# Batch compilation
+##################
+
+# Compiles many documents across a process pool. Each worker has its own Compiler, id allocator and
+# import fragments, so nothing is shared between documents. Results hold the plain data form of the compiled
+# tree (Compiler.to_document), which pickles cheaply back to the parent and holds no pygame surfaces.
+# With the cache on, a batch compile also warms ./.pymcache, so the game's own initialize() skips lexing.
+
+
+class CompileResult(NamedTuple):
+    path:str
+    document:dict|None # None if the compile failed
+    error:str|None
+    seconds:float
+
+
+def compile_one(path:str, use_cache:bool=True, cache_dir:str=cache.CACHE_DIR) -> CompileResult:
+    start = time.perf_counter()
+    try:
+        with recoverable():
+            compiler = Compiler(path, use_cache, cache_dir)
+    except FatalError as error:
+        return CompileResult(path, None, error.message.strip(), time.perf_counter()-start)
+    except Exception as error: # e.g. a broken styles file, one bad document must not take the batch down
+        return CompileResult(path, None, f"{type(error).__name__}: {error}", time.perf_counter()-start)
+    finally:
+        flush_log() # pool workers exit without running atexit
+    return CompileResult(path, compiler.to_document(), None, time.perf_counter()-start)
+
+
+def _compile_task(task:tuple[str,bool,str]) -> CompileResult:
+    return compile_one(*task)
+
+
+def compile_many(paths:list[str], workers:int=None, use_cache:bool=True, cache_dir:str=cache.CACHE_DIR) -> list[CompileResult]:
+    """Compiles every path, in parallel over `workers` processes (default: one per core).
+    Results come back in the same order as the paths. Failed compiles carry their error instead of a document"""
+    tasks = [(path, use_cache, cache_dir) for path in paths]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1: # not worth starting a pool for
+        return [_compile_task(task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_compile_task, tasks, chunksize=chunksize))
+
+
+def errors(results:list[CompileResult]) -> dict[str,str]:
+    return {result.path:result.error for result in results if result.error is not None}
+
+
+##################
+# CLI
+##################
+
+def main(argv:list[str]=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m src.compiler.batch', description='Compile many .pym documents in parallel')
+    parser.add_argument('paths', nargs='+', help='.pym documents to compile')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--no-cache', action='store_true', help='always compile from source and do not write the cache')
+    parser.add_argument('--cache-dir', default=cache.CACHE_DIR)
+    parser.add_argument('--json', metavar='FILE', help='write the results (documents and errors) to FILE as JSON')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = compile_many(args.paths, args.jobs, not args.no_cache, args.cache_dir)
+    elapsed = time.perf_counter() - start
+    failed = errors(results)
+
+    for path, error in failed.items():
+        print(f"FAILED {path}: {error}", file=sys.stderr)
+    print(f"Compiled {len(results)-len(failed)}/{len(results)} documents in {elapsed:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([result._asdict() for result in results], f)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import hashlib
+import marshal
+import os
+import sys
+
+##################
+# Compiled document cache
+##################
+
+# Compiled documents are stored as plain python data (dicts, lists, strings) through marshal, which keeps the
+# files small and fast to load. Each cache file remembers the content hash of every file that went into the
+# document, so any change to the root file or one of its imports throws the cached version away.
+
+CACHE_DIR = './.pymcache'
+# Bump whenever Compiler.to_document/from_document or the elements and style records they rebuild change shape,
+# so files written by an older compiler are thrown away instead of rebuilt into the wrong tree.
+# 2: precompiled style records, slotted elements with shared style data, per-Compiler ids
+FORMAT_VERSION = 2
+_HEADER = (FORMAT_VERSION, sys.version_info[:2])
+
+
+def hash_content(content:str|bytes) -> str:
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def content_hasher():
+    # for hashing a file piece by piece while it is read, gives the same digest as hash_content
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_file(path:str) -> str|None:
+    # read as text so the digest matches the one the compiler takes of the decoded content
+    try:
+        with open(path,'r') as f:
+            return hash_content(f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def cache_path(path:str, cache_dir:str=CACHE_DIR) -> str:
+    # one cache file per root document, named after its absolute path
+    name = hash_content(os.path.abspath(path))
+    return os.path.join(cache_dir, f'{name}.pymc')
+
+
+def load(path:str, cache_dir:str=CACHE_DIR) -> tuple[dict[str,str],dict]|None:
+    """Returns the dependency hashes and the cached document for `path`, or None if there is none or any dependency changed"""
+    try:
+        with open(cache_path(path, cache_dir),'rb') as f:
+            header, dependencies, document = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if header != _HEADER:
+        return None
+
+    for dependency, digest in dependencies.items():
+        if hash_file(dependency) != digest:
+            return None
+    return dependencies, document
+
+
+def store(path:str, dependencies:dict[str,str], document:dict, cache_dir:str=CACHE_DIR) -> None:
+    target = cache_path(path, cache_dir)
+    temp = f'{target}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp,'wb') as f:
+            marshal.dump((_HEADER, dependencies, document), f)
+        os.replace(temp, target) # so a half written file is never read back
+    except (OSError, ValueError):
+        # the cache is only an optimization, a failed write just means we compile again next time
+        if os.path.exists(temp):
+            os.remove(temp)
@@ -1,7 +1,15 @@
-from typing import Self, Any
+from typing import Self, Any, NamedTuple
 import pygame as pg
 import json
+import re
+import sys
+import io
+from time import perf_counter
+from types import MappingProxyType
 from ..utils.logging import log, LogLevel, reset_log
+from ..utils.ids import IdAllocator
+from ..utils.stats import Stats
+from . import cache
 # just as a reminder for future me to set editor font to consolas monospace
 
 ##################
@@ -31,11 +39,11 @@ T_KW = 'T_KW'
 T_BACK = 'T_BACK'
 T_DOLLAR = 'T_DOLLAR'
 
-class Token:
-    def __init__(self, type_, value):
-        self.type = type_
-        self.value = value
-    
+class Token(NamedTuple):
+    # a plain tuple underneath, so building one per token is about as cheap as it gets
+    type:str
+    value:str
+
     def __repr__(self):
         if self.value: return f'{self.type}:{self.value}'
         return f'{self.type}'
@@ -55,8 +63,95 @@ STYLES = {
     "corner-radius":{"types":['number'], "default":0},
     "border-width":{"types":['number'], "default":0},
     "border-color":{"types":['rgbvalue'], "default":None},
+    "font-size":{"types":['number'], "default":20},
+    "color":{"types":['rgbvalue'], "default":(0,0,0)},
 }
 
+##################
+# Style records
+##################
+
+# Styles are parsed into these records once, at compile time. Anything that can not change between renders
+# is already final in `static`, so the View only has to resolve parent relative percentages and states
+
+S_NUMBER = 'S_NUMBER'
+S_PERCENTAGE = 'S_PERCENTAGE' # only for percentages of the parent size, others are turned into numbers
+S_RGB = 'S_RGB'
+S_TEXT = 'S_TEXT'
+S_STATE = 'S_STATE'
+
+_DIGITS = re.compile(r"(\d+)")
+DEFAULT_STYLES = {style:STYLES[style]['default'] for style in STYLES}
+
+
+def parse_style_value(style:str, raw) -> tuple[str,Any]|None:
+    """Parses one style value into (kind, value). Returns None if the value is not valid for the style"""
+    raw = str(raw).strip()
+    if raw.startswith('$$'):
+        return (S_STATE, raw[2:])
+
+    rules = STYLES[style]
+    acceptable_types = rules['types']
+    if "percentage" in acceptable_types and raw.endswith('%'):
+        try:
+            fraction = float(raw[:-1]) / 100
+        except ValueError:
+            return None
+        if rules['max'] in ['parentwidth','parentheight']:
+            return (S_PERCENTAGE, fraction)
+        return (S_NUMBER, fraction * rules['max'])
+
+    if "number" in acceptable_types:
+        try:
+            return (S_NUMBER, float(raw))
+        except ValueError:
+            pass
+
+    if "rgbvalue" in acceptable_types:
+        digits = _DIGITS.findall(raw)
+        if len(digits) == 3:
+            return (S_RGB, tuple(map(int,digits)))
+
+    if "text" in acceptable_types and raw in rules['accepted']:
+        return (S_TEXT, raw)
+    return None
+
+
+class StyleRecord:
+    # Records are never changed after they are built, so elements with the same style share one
+    __slots__ = ('static', 'percentages', 'states')
+    static:dict[str,Any] # final values of the styles that were set, everything else is in DEFAULT_STYLES
+    percentages:tuple[tuple[str,float]] # (style, fraction of the parent width or height)
+    states:tuple[tuple[str,str]] # (style, state name), parsed when rendered since the value can change
+
+    def __init__(self, static:dict[str,Any], percentages:tuple=(), states:tuple=()):
+        self.static = static
+        self.percentages = percentages
+        self.states = states
+
+
+def build_style_record(style:dict[str,str]) -> tuple[StyleRecord, list[str]]:
+    """Builds the record for an element style. Also returns the styles with invalid values"""
+    static = {}
+    percentages = []
+    states = []
+    invalid = []
+    for key, raw in style.items():
+        if key not in STYLES: # only state bound styles get here without being checked, they never render
+            continue
+        parsed = parse_style_value(key, raw)
+        if parsed is None:
+            invalid.append(key)
+            continue
+        kind, value = parsed
+        if kind == S_PERCENTAGE:
+            percentages.append((key, value))
+        elif kind == S_STATE:
+            states.append((key, value))
+        else:
+            static[key] = value
+    return StyleRecord(static, tuple(percentages), tuple(states)), invalid
+
 ##################
 # Syntax Tree
 ##################
@@ -80,7 +175,8 @@ SYNTAX_TREE = {
 ##################
 # ELEMENTS
 ##################
-_past_ids = []
+_default_ids = IdAllocator() # for elements made outside of a Compiler
+_EMPTY = MappingProxyType({}) # read-only stand-in shared by every element until it gets a dict of its own
 
 class Element: 
     # So I'm mostly done with state stuff I just need to add comprehension.
@@ -97,23 +193,34 @@ class Element:
     surf:pg.Surface
     surf_rect:pg.Rect
     computed_styles:dict
+    style_record:'StyleRecord'
+
+    # Slotted, since generated menus can hold tens of thousands of elements and a per-instance __dict__ costs more
+    # than the data in it. Subclasses add slots for their own operands
+    __slots__ = ('type', 'id', 'parent_id', 'children', 'computed_styles', 'style', 'style_record',
+                 'surf', 'surf_rect', 'raster', 'raster_key', 'scoped_styles', 'children_allowed')
 
-    def __init__(self, type_:str, parent_id:str|None, style:dict[str,str]={}, id_:str=None, scoped_styles:dict={}, children_allowed:bool=True):
+    def __init__(self, type_:str, parent_id:str|None, style:dict[str,str]=None, id_:str=None, scoped_styles:dict=None, children_allowed:bool=True, ids:IdAllocator=None):
         self.type = type_
         self.id = id_
         self.parent_id:str = parent_id
-        self.children = []
-        self.computed_styles = {}
-        self.style = style
-        self.scoped_styles = scoped_styles
+        self.children = [] if children_allowed else ()
+        self.computed_styles = _EMPTY # replaced by the View on the first render
+        self.style = style if style is not None else {}
+        self.style_record = None # filled in by the compiler
+        self.surf = None
+        self.surf_rect = None
+        self.raster = None # last unrotated image, reused by the View while raster_key stays the same
+        self.raster_key = None
+        self.scoped_styles = scoped_styles if scoped_styles is not None else _EMPTY
         self.children_allowed = children_allowed
 
+        if ids is None:
+            ids = _default_ids
         if not self.id:
-            self.id = _create_id(self)
-        else:
-            if self.id in _past_ids:
-                log(f"ID {self.id} already exists. This overwrites the previous element.", LogLevel.WARNING)
-            _past_ids.append(self.id)
+            self.id = _create_id(self, ids)
+        elif not ids.claim(self.id):
+            log("ID %s already exists. This overwrites the previous element.", LogLevel.WARNING, self.id)
 
     def __repr__(self):
         return f'ID: `{self.id}` ; TYPE: `{self.type}` ; Parent_ID: `{str(self.parent_id)}` ; STYLE_TAGS: `{self.style}`;'
@@ -144,8 +251,9 @@ class ImageElement(Element):
     required={
         "src":[]
     }
-    def __init__(self, parent_id:str, style:dict[str,str]={},id_:str=None,src:str=''):
-        super().__init__('image',parent_id,style,id_,{},False)
+    __slots__ = ('src',)
+    def __init__(self, parent_id:str, style:dict[str,str]=None,id_:str=None,src:str='',ids:IdAllocator=None):
+        super().__init__('image',parent_id,style,id_,None,False,ids)
         self.src = src
 
 
@@ -156,8 +264,9 @@ class TextElement(Element):
         "text":[],
         "modifiable":["True", "False"]
     }
-    def __init__(self, parent_id:str,style:dict[str,str]={},id_:str=None,text:str='',modifiable:str="False"):
-        super().__init__('text',parent_id,style,id_,{},False)
+    __slots__ = ('text', 'modifiable')
+    def __init__(self, parent_id:str,style:dict[str,str]=None,id_:str=None,text:str='',modifiable:str="False",ids:IdAllocator=None):
+        super().__init__('text',parent_id,style,id_,None,False,ids)
         self.text = text
         self.modifiable = modifiable
     def __str__(self):
@@ -165,13 +274,15 @@ class TextElement(Element):
 
 class DivElement(Element):
     required={}
-    def __init__(self, parent_id:str,style:dict[str,str]={},id_:str=None):
-        super().__init__('div',parent_id,style,id_,{},True)
+    __slots__ = ()
+    def __init__(self, parent_id:str,style:dict[str,str]=None,id_:str=None,ids:IdAllocator=None):
+        super().__init__('div',parent_id,style,id_,None,True,ids)
 
 class FrameElement(Element):
     required={}
-    def __init__(self,parent_id:str,style:dict[str,str]={},id_:str=None):
-        super().__init__('frame', parent_id, style, id_, {}, True)
+    __slots__ = ()
+    def __init__(self,parent_id:str,style:dict[str,str]=None,id_:str=None,ids:IdAllocator=None):
+        super().__init__('frame', parent_id, style, id_, None, True, ids)
 
 
 #############################
@@ -187,16 +298,30 @@ class State:
 
     value:str|int|float
     name:str
+    listeners:list
 
     def __init__(self,name, initial_value:str=None):
 
         self.name = name
+        self.listeners = [] # called with the state whenever its value changes, this is how a View hears about it
+        self.value = None
         self.set(initial_value)
     
     def set(self,value):
         if type(value) not in [str,int,float]:
             raise StateTypeError()
+        if value == self.value:
+            return
         self.value = value
+        for listener in self.listeners:
+            listener(self)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
     
     def get(self,value):
         if not self.value:
@@ -208,15 +333,8 @@ class State:
 
 
 
-def _create_id(object:Element):
-
-    id_suffix = 0
-    object_type = object.type
-
-    while (id := object_type+str(id_suffix)) in _past_ids: 
-        id_suffix += 1
-    _past_ids.append(id)
-    return id
+def _create_id(object:Element, ids:IdAllocator):
+    return ids.create(object.type)
 #############################################################
 
 ELEMENTS:list[Element] = {
@@ -233,44 +351,49 @@ class Error:
         log(text,LogLevel.FATAL)
 
 
+def _where(line_number:int|str|None) -> str:
+    # the compiler passes "path:line", so an error inside an imported file names the file
+    return line_number if isinstance(line_number, str) else f"Line {line_number}"
+
+
 class IllegalCharError(Error):
     def __init__(self, line_number:int=None, line:str='', char:str='', message='IllegalCharError: Illegal character'):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >> {message} `{char}`"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >> {message} `{char}`"
         super().__init__(text)
 
 class StringNotEnded(Error):
     def __init__(self, line_number:int=None, line:str=''):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  String not Ended"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  String not Ended"
         super().__init__(text)
 
 class SyntaxIncorrect(Error):
     def __init__(self, line_number:int=None, line:str='', message='Syntax Error'):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  {message}"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  {message}"
         super().__init__(text)
 
 class ImportFailed(Error):
     def __init__(self, line_number:int=None, line:str='', path:str=''):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  Import Error: Import of `{path}` failed. Try using absolute imports from the CWD"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  Import Error: Import of `{path}` failed. Try using absolute imports from the CWD"
         super().__init__(text)
 
 class NameSpaceError(Error):
     def __init__(self, line_number:int=None, line:str='', namevalue=''):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  NamespaceError: {namevalue} not a valid name"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  NamespaceError: {namevalue} not a valid name"
         super().__init__(text)
 
 class ScopeError(Error):
     def __init__(self, line_number:int=None, line:str=''):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  ScopeError: Identifier not allowed in current scope"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  ScopeError: Identifier not allowed in current scope"
         super().__init__(text)
 
 class FrameRequiredError(Error):
     def __init__(self, line_number:int=None, line:str='', type_:str=''):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  FrameRequiredError: Element {type_} requires a frame to be under Global scope"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  FrameRequiredError: Element {type_} requires a frame to be under Global scope"
         super().__init__(text)
 
 class StateImplementError(Error):
     def __init__(self, line_number:int=None, line:str='', message='State can not be applied in element with previous values'):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  StateImplementError: {message}"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  StateImplementError: {message}"
         super().__init__(text)
 
 class StateTypeError(Error):
@@ -285,7 +408,7 @@ class StateNotInitializedError(Error):
 
 class StyleError(Error):
     def __init__(self, line_number:int=None, line:str='', message='Style does not exist'):
-        text = f"\n\n\nLine {line_number}| \"    {line}    \"    >>  StyleError : {message}"
+        text = f"\n\n\n{_where(line_number)}| \"    {line}    \"    >>  StyleError : {message}"
         super().__init__(text=text)
 ##################
 # LEXER
@@ -294,109 +417,58 @@ class StyleError(Error):
 # For parent/ Children, use a stack showing what the current parent is, so that switching back and forth is easy
 
 
+# Every single-character token the lexer knows. Tokens are immutable, so the scanner hands out these same
+# instances instead of building a new one each time
+PUNCTUATION = {
+    '>':Token(T_ADVANCE,'>'),
+    ';':Token(T_SEMICOLON,';'),
+    '[':Token(T_LBRCK,'['),
+    ']':Token(T_RBRCK,']'),
+    '=':Token(T_EQ,'='),
+    '/':Token(T_FSLASH,'/'),
+    '<':Token(T_BACK,'<'),
+    '$':Token(T_DOLLAR,'$'),
+}
+
+# One pass over the line. Groups are: a closed 'datavalue', a lone quote that is never closed,
+# a punctuation character, and a namevalue with a lookahead telling if a quote follows directly after it
+# (the char lexer drops a namevalue that runs straight into a quote, so this one does too).
+# Anything else (spaces and tabs) matches none of the groups and gets skipped.
+_SCANNER = re.compile(r"('[^']*')|(')|([>;\[\]=/<$])|([^ \t'>;\[\]=/<$]+)(?=('?))|[ \t]+")
+_new_token = tuple.__new__ # skips the python level NamedTuple.__new__
+
+
+def tokenize(text:str, index:int=None, path:str=None) -> list[Token]:
+    """Tokenizes one stripped line. Gives the same tokens as the original character by character lexer (benchmarks/lexer_bench.py)"""
+    tokens = []
+    append = tokens.append
+    for data, unended, punctuation, name, quote_next in _SCANNER.findall(text):
+        if name:
+            if not quote_next:
+                append(_new_token(Token,(T_NAMEVALUE,name.strip())))
+        elif punctuation:
+            append(PUNCTUATION[punctuation])
+        elif data:
+            append(_new_token(Token,(T_DATAVALUE,data[1:-1].strip())))
+        elif unended:
+            raise StringNotEnded(index if path is None else f"{path}:{index}", text)
+    return tokens
+
+
 class Lexer:
     text:str
-    current_char:str
-    current_build:str
-    mode:list[Any]
     tokens:list[Token] = []
     parent:Element
 
     def __init__(self):
-        ...
-    
+        self.path = None # file the lines come from, for error messages
+
     def new_line(self,line:str, index:int, parent:Element = None):
         self.text = line.strip()
         self.parent = parent
         self.index = index
-        self.current_build = ''
-        self.mode = [self.default_search] # A stack for me to easily switch between different search patterns
-        self.tokens = []
-        if self.text: 
-            self.make_tokens()
-    
-    def make_tokens(self):
-        for i, char in enumerate(self.text):
-            
-            self.mode[-1](char) # The top of the stack is the capture method that is executed
-
-        
-        ####### To clear up any escaped builds #######
+        self.tokens = tokenize(self.text, index, self.path) if self.text else []
 
-        if self.mode[-1] == self.value_search: # This logic is to capture any components at the end of the string
-            raise StringNotEnded(self.index, self.text)
-        
-        elif self.current_build != '':
-            self.tokens.append(Token(T_NAMEVALUE,self.current_build.strip()))
-
-    ##############################################################
-
-    def flush_build(self):
-        if self.current_build != '':
-            self.tokens.append(Token(T_NAMEVALUE,self.current_build.strip()))
-        self.current_build = ''
-
-    def default_search(self,char:str):
-        if char == ' ' or char == '\t':
-            self.flush_build()
-
-        
-        elif char == '\'':
-            self.current_build = ''
-            self.mode.append(self.value_search)
-        
-
-        elif char == '>': # In The future I could probably make this way more concise but for now it works
-            self.flush_build()
-            self.tokens.append(Token(T_ADVANCE,char))
-            
-        
-        elif char == ';':
-            self.flush_build()
-            self.tokens.append(Token(T_SEMICOLON,char))
-
-
-        elif char == '[':
-            self.flush_build()
-            self.tokens.append(Token(T_LBRCK,char))
-
-
-        elif char == ']':
-            self.flush_build()
-            self.tokens.append(Token(T_RBRCK,char))
-
-
-        elif char == '=':
-            self.flush_build()
-            self.tokens.append(Token(T_EQ,char))
-
-
-        elif char == '/':
-            self.flush_build()
-            self.tokens.append(Token(T_FSLASH,char))
-
-        elif char == '<':
-            self.flush_build()
-            self.tokens.append(Token(T_BACK,char))
-
-        elif char == '$':
-            self.flush_build()
-            self.tokens.append(Token(T_DOLLAR,char))
-        else:
-            self.current_build += char
-
-    ##############################################################
-
-    def value_search(self, char:str):
-        if char == '\'':
-            self.tokens.append(Token(T_DATAVALUE,self.current_build.strip()))
-            self.current_build = ''
-            self.mode.pop()
-        # elif char in ILLEGAL_DATA_NAMESPACES:
-        #     raise IllegalCharError(self.index,self.text, char)
-        else:
-            self.current_build += char
-            
 ##################
 # Compiler
 ##################
@@ -408,26 +480,64 @@ class Compiler:
     compiled:list[Element]
     states:dict[str,State]
     frames:dict[str,list[State]]
+    state_dependencies:dict[str,set[str]]
 
-    def __init__(self, path:str): # Use token patterns to figure out what type the line is
+    def __init__(self, path:str, use_cache:bool=True, cache_dir:str=cache.CACHE_DIR, previous:Self=None, keep_fragments:bool=False): # Use token patterns to figure out what type the line is
         self.lexer = Lexer()
-        self.global_scope = Element(type_="global",id_="global", parent_id=None,style={'width:100%/height:100%;'})
+        self.ids = IdAllocator() # ids are scoped to the compilation, so many documents can compile in one process
+        self.global_scope = Element(type_="global",id_="global", parent_id=None,style={'width:100%/height:100%;'},ids=self.ids)
         self.parent_stack = [self.global_scope]
         self.compiled:dict[str,Element] = {"global":self.global_scope}
         self.path = path
         self.states = {}
         self.frames = {}
-        self.uncompiled = []
-        self.index = 0
+        self.state_dependencies = {} # state name -> ids of the elements that read it
+        self.style_records:dict[tuple,StyleRecord] = {}
+        self.sources = [] # stack of lazy line iterators, one per file that is currently open
+        self.index = 0 # line number inside the file currently being read
+        self.current_path = path
+        # parsed lines of every imported file read so far, for repeated imports. They are dropped once the compile
+        # is done unless keep_fragments (hot reload, as `previous` for the next compile), which also keeps the root's
+        self.fragments:dict[str,list] = {}
+        self.keep_fragments = keep_fragments
+        self.dependencies:dict[str,str] = {} # content hash of every file read while compiling, for the cache
+        # fragments of an earlier compile (hot reload), reused for every file whose content hash still matches
+        self.previous_fragments:dict[str,tuple[str,list]] = {}
+        if previous is not None:
+            self.previous_fragments = {file:(previous.dependencies[file], fragment) for file, fragment in previous.fragments.items()}
+        self.from_cache = False
+        self.stats = Stats() # phase timings, the whole compile is one frame
+
+        start = perf_counter()
+        if use_cache and (cached := cache.load(path, cache_dir)) is not None:
+            dependencies, document = cached
+            self.from_document(document, dependencies)
+            self.from_cache = True
+            self.stats.add('cache_load', perf_counter()-start)
+            self.stats.end_frame()
+            return
+
         self.syntax_tree = dict()
+        self.syntax_matcher = dict()
         self.parse_syntax_tree()
         # print(self.syntax_tree)
-        self.extract_path(path,0, '')
+        self.extract_path(path, '')
         self.compile()
-        # print(*self.uncompiled,sep='\n')
+        self.previous_fragments = {}
+        if not keep_fragments:
+            self.fragments = {}
+        if use_cache:
+            start = perf_counter()
+            cache.store(path, self.dependencies, self.to_document(), cache_dir)
+            self.stats.add('cache_store', perf_counter()-start)
+        self.stats.end_frame()
 
     ##############################################################
 
+    def where(self) -> str:
+        # location of the line being compiled, for error messages
+        return f"{self.current_path}:{self.index}"
+
     def parse_syntax_tree(self):
 
         syntax_keys = list(SYNTAX_TREE.keys())
@@ -448,72 +558,139 @@ class Compiler:
                 "identifier":identifier_structure,
                 "options":options_structure
             }
+
+            # Also file the identifier into a trie keyed on token types, so matching a line only walks
+            # as many tokens as the longest identifier no matter how many syntax forms exist
+            node = self.syntax_matcher
+            for tok_type in identifier_structure:
+                node = node.setdefault(tok_type,{})
+            if None in node:
+                raise Error(f'Syntax forms {node[None]} and {key} have the same identifier')
+            node[None] = key # None marks the end of an identifier, token types are never None
             
 
 
 
-    def extract_path(self,path:str, insert_index:0,line):
+    def extract_path(self,path:str,line):
+        # Puts the file on top of the source stack, so it is compiled before the rest of the file that
+        # imported it. A file that was already read during this compilation is replayed from its fragment
+        # instead, which skips the disk read, the lexer and the syntax matching
+        if path in self.fragments:
+            self.sources.append((path, iter(self.fragments[path])))
+            self.stats.count('fragment_replays')
+            return
+        start = perf_counter()
         try:
-            with open(path,'r') as f:
-                self.uncompiled = self.uncompiled[:insert_index+1] + f.read().split('\n') + self.uncompiled[insert_index+1:]
+            f = open(path,'r')
         except FileNotFoundError:
-            raise ImportFailed(self.index, line)
+            raise ImportFailed(self.where(), line)
+        if path in self.previous_fragments:
+            # read it whole to hash it, reading is cheap next to lexing. A changed file streams from what was read
+            with f:
+                content = f.read()
+            self.stats.add('import_io', perf_counter()-start)
+            digest, fragment = self.previous_fragments[path]
+            if cache.hash_content(content) == digest:
+                self.dependencies[path] = digest
+                self.fragments[path] = fragment
+                self.sources.append((path, iter(fragment)))
+                self.stats.count('fragment_reuses')
+                return
+            f = io.StringIO(content)
+        else:
+            self.stats.add('import_io', perf_counter()-start)
+        self.sources.append((path, self.stream_file(path, f)))
+
+    def stream_file(self, path:str, f):
+        # Lazily reads, lexes and matches the lines of a file, recording them as the file's fragment.
+        # The root document can not be imported again, so it only gets one if fragments outlive the compile
+        digest = cache.content_hasher()
+        fragment = [] if self.keep_fragments or path != self.path else None
+        stats = self.stats
+        index = 0
+        with f:
+            while True:
+                start = perf_counter()
+                raw_line = f.readline()
+                lex_start = perf_counter()
+                stats.add('import_io', lex_start-start)
+                if not raw_line:
+                    break
+                index += 1
+                digest.update(raw_line.encode())
+                line = raw_line.strip()
+                self.lexer.path = path # sources interleave, so this is set per line
+                self.lexer.new_line(line,index)
+                match_start = perf_counter()
+                stats.add('lex', match_start-lex_start)
+                if not self.lexer.tokens: 
+                    continue
+                parsed = (index, line, self.lexer.tokens, self.match_tokens(self.lexer.tokens,line))
+                stats.add('match', perf_counter()-match_start)
+                if fragment is not None:
+                    fragment.append(parsed)
+                yield parsed
+        self.dependencies[path] = digest.hexdigest()
+        if fragment is not None:
+            self.fragments[path] = fragment
             
     ##############################################################
 
     def compile(self):
-        while self.index < len(self.uncompiled):
-            line:str = self.uncompiled[self.index].strip()
-
-
-
-            self.lexer.new_line(line,self.index+1)
-            if not self.lexer.tokens: 
-                self.index += 1
+        line = ''
+        while self.sources:
+            path, lines = self.sources[-1]
+            parsed = next(lines, None)
+            if parsed is None: # file finished, carry on with whatever imported it
+                self.sources.pop()
                 continue
 
-            syntax_type = self.match_tokens(self.lexer.tokens,line)
+            # Elements are still built line by line at every import site, since classes resolve against
+            # the scope the fragment is imported into and every copy needs its own ids
+            self.index, line, tokens, syntax_type = parsed
+            self.current_path = path
+            start = perf_counter()
             
             if self.parent_stack[-1].type == 'text' and syntax_type != "CLOSE_ELEMENT":
-                self.handle_text(self.lexer.tokens,line,syntax_type)
+                self.handle_text(tokens,line,syntax_type)
+                phase = 'handle_text'
 
             elif syntax_type == "COMMENT":
-                ...
+                continue
             
             elif syntax_type == "IMPORT":
-                self.handle_import(self.lexer.tokens,line)
+                self.handle_import(tokens,line)
+                phase = 'handle_import'
             
             elif syntax_type == "OPEN_ELEMENT":
-                self.handle_open_element(self.lexer.tokens,line,syntax_type)
+                self.handle_open_element(tokens,line,syntax_type)
+                phase = 'handle_open_element'
             
             elif syntax_type == "CLOSE_ELEMENT":
-                self.handle_close_element(self.lexer.tokens,line,syntax_type)
+                self.handle_close_element(tokens,line,syntax_type)
+                phase = 'handle_close_element'
             elif syntax_type == "STATE":
-                self.handle_state(self.lexer.tokens,line,syntax_type)
+                self.handle_state(tokens,line,syntax_type)
+                phase = 'handle_state'
             else:
-                raise SyntaxIncorrect(self.index,line,"Syntax Error. Perhaps you forgot an identifier?")
+                raise SyntaxIncorrect(self.where(),line,"Syntax Error. Perhaps you forgot an identifier?")
+            self.stats.add(phase, perf_counter()-start)
             # print(self.parent_stack, "\n",) For checking scope
 
-            self.index += 1
         if len(self.parent_stack) > 1:
-            raise SyntaxIncorrect(self.index, line, f"At least one Element not closed. Try checking if you forgot a call of type CLOSE ELEMENT")
+            raise SyntaxIncorrect(self.where(), line, f"At least one Element not closed. Try checking if you forgot a call of type CLOSE ELEMENT")
     
     ##############################################################
 
     def match_tokens(self, tokens:list[Token],line):
-
+        # walk the identifier trie, the longest identifier that fits the start of the line wins
         syntax_type = ''
-        for key in self.syntax_tree:
-
-            for i,tok_type in enumerate(self.syntax_tree[key]['identifier']):
-                
-                if tokens[i].get_type() != tok_type:
-                    
-                    break
-
-                if i == len(self.syntax_tree[key]['identifier'])-1:
-                    syntax_type = key
-
+        node = self.syntax_matcher
+        for tok in tokens:
+            node = node.get(tok.type)
+            if node is None:
+                break
+            syntax_type = node.get(None,syntax_type)
 
         # print(syntax_type)
         return syntax_type
@@ -525,25 +702,30 @@ class Compiler:
         path = tokens[4]
 
         if not self.parent_stack[-1].children_allowed:
-            raise ScopeError(self.index,line)
+            raise ScopeError(self.where(),line)
         # import type and path are static always so I can assign them like that
 
-        self.uncompiled[self.index] = ''
         if import_type.value == "markdown":
-            self.extract_path(path.value,self.index,line)
+            self.extract_path(path.value,line)
 
         elif import_type.value == "styles":
             try:
+                start = perf_counter()
                 with open(path.value,'r') as f:
-                    raw_styles = json.load(f)
+                    content = f.read()
+                self.stats.add('import_io', perf_counter()-start)
+                raw_styles = json.loads(content)
+                self.dependencies[path.value] = cache.hash_content(content)
             except FileNotFoundError:
-                raise ImportFailed(self.index, line)
+                raise ImportFailed(self.where(), line)
 
             # This is to scope classes to their specific zones, so that styles can be overwritten in certain scopes
+            if self.parent_stack[-1].scoped_styles is _EMPTY:
+                self.parent_stack[-1].scoped_styles = {}
             for key in raw_styles:
                 self.parent_stack[-1].scoped_styles[key] = raw_styles[key]
                 if any(i not in STYLES.keys() for i in raw_styles[key]):
-                    raise StyleError(self.index,line,f"One or more styles from file `{path.value}` does not exist")
+                    raise StyleError(self.where(),line,f"One or more styles from file `{path.value}` does not exist")
                 
     ##############################################################
 
@@ -551,7 +733,7 @@ class Compiler:
     def handle_open_element(self,tokens:list[Token],line:str,syntax_type:str):
 
         if not self.parent_stack[-1].children_allowed:
-            raise ScopeError(self.index,line)
+            raise ScopeError(self.where(),line)
 
         tok_types = []
         for tok in tokens:
@@ -561,13 +743,13 @@ class Compiler:
         type_ = tokens[1].value
         
         if type_ not in ELEMENTS.keys(): # Check to make sure the user only uses predefined elements
-            raise NameSpaceError(self.index,line,type_)
+            raise NameSpaceError(self.where(),line,type_)
         
         # special handling for frame element
         if type_ == 'frame' and not self.parent_stack[-1].type=='global':
-            raise ScopeError(self.index,line)
+            raise ScopeError(self.where(),line)
         elif type_ != 'frame' and self.parent_stack[-1].type == 'global':
-            raise FrameRequiredError(self.index,line,type_)
+            raise FrameRequiredError(self.where(),line,type_)
 
         options_structure = self.syntax_tree[syntax_type]['options']
         type_search_index = 0
@@ -587,14 +769,14 @@ class Compiler:
         cur_val:str = ''
         for i,tok in enumerate(tokens[2:]): # past the element declaration
             if tok.get_type() != options_structure[type_search_index]: # Raise error if structure is not followed
-                raise SyntaxIncorrect(self.index, line, f"Syntax Error. {tok.get_type()} not in right place or not supported in OPTIONS structure {options_structure}.")
+                raise SyntaxIncorrect(self.where(), line, f"Syntax Error. {tok.get_type()} not in right place or not supported in OPTIONS structure {options_structure}.")
             
             # Keyword checking
             if tok.get_type() == T_NAMEVALUE:
                 if tok.value in seen_keywords: 
-                    raise SyntaxIncorrect(self.index, line, f"Syntax Error: {tok.value} used twice.")
+                    raise SyntaxIncorrect(self.where(), line, f"Syntax Error: {tok.value} used twice.")
                 elif tok.value not in datapoints.keys() and tok.value not in required_operands:
-                    raise SyntaxIncorrect(self.index, line, f"Syntax Error: {tok.value} not a valid operand.")
+                    raise SyntaxIncorrect(self.where(), line, f"Syntax Error: {tok.value} not a valid operand.")
                 cur_kw = tok.value
                 seen_keywords.append(tok.value)
 
@@ -608,7 +790,7 @@ class Compiler:
 
             if type_search_index == 0:
                 if not cur_kw or not cur_val:
-                    raise SyntaxIncorrect(self.index,line,f"Syntax Error: Error with operand values")
+                    raise SyntaxIncorrect(self.where(),line,f"Syntax Error: Error with operand values")
                 if cur_kw in datapoints.keys(): # If its a hardcoded datapoint
                     datapoints[cur_kw] = cur_val
                 elif cur_kw in operand_restrict.keys(): # If its a element-specific datapoint
@@ -616,7 +798,7 @@ class Compiler:
                     if len(operand_restrict[cur_kw]) != 0:
                         
                         if cur_val not in operand_restrict[cur_kw]:
-                            raise SyntaxIncorrect(self.index,line,f"Syntax Error: {cur_val} not valid assignment to {cur_kw}")
+                            raise SyntaxIncorrect(self.where(),line,f"Syntax Error: {cur_val} not valid assignment to {cur_kw}")
                         
 
                     operands[cur_kw] = cur_val
@@ -625,21 +807,21 @@ class Compiler:
 
         
         if type_search_index != 0: # Raise error if structure is unfinished
-            raise SyntaxIncorrect(self.index, line, f"Syntax Error. Operand structure {options_structure} not completed, missing elements {options_structure[type_search_index:]}.")
+            raise SyntaxIncorrect(self.where(), line, f"Syntax Error. Operand structure {options_structure} not completed, missing elements {options_structure[type_search_index:]}.")
         # print(datapoints)
 
 
         style = {}
         if datapoints["class"]: #state declaration is illegal here
             if '$' in datapoints["class"]:
-                IllegalCharError(self.index,line,'$', "IllegalCharError: State definition not allowed in class value")
+                IllegalCharError(self.where(),line,'$', "IllegalCharError: State definition not allowed in class value")
 
             for element in self.parent_stack[::-1]: # reverse iterate to find the most recently scope version of the class
                 if datapoints["class"] in element.scoped_styles:
                     
                     scoped_class = element.scoped_styles[datapoints['class']]
                     for item in scoped_class:
-                        style[item] = scoped_class[item]
+                        style[sys.intern(item)] = scoped_class[item]
                     break
         
         if datapoints["style"]: # split up the styles into keypairs
@@ -647,34 +829,38 @@ class Compiler:
                 raw = item.split(':')
 
                 if len(raw) > 2 or len(raw) < 2:
-                    raise SyntaxIncorrect(self.index,line,f"`:` Symbol must act as a divider between key:value pairs, and must exist.")
+                    raise SyntaxIncorrect(self.where(),line,f"`:` Symbol must act as a divider between key:value pairs, and must exist.")
 
                 key,value = raw
+                key = sys.intern(key) # the same few style names and values repeat on every element
+                value = sys.intern(value)
                 style[key] = value
                 contains_state = True
                 # check for state errors
                 if '$' in value:
                     
                     if not value.startswith('$$'):
-                        raise IllegalCharError(self.index,value,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
+                        raise IllegalCharError(self.where(),value,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
                     elif not value.count('$') == 2:
-                        raise IllegalCharError(self.index,value,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
+                        raise IllegalCharError(self.where(),value,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
                     contains_state = False
 
                     if value[2:] not in self.states.keys(): # make the error for this
-                        raise StateImplementError(self.index,value,"State referenced which does not exist")
+                        raise StateImplementError(self.where(),value,"State referenced which does not exist")
                 else:
                     if key not in STYLES.keys():
-                        raise StyleError(self.index,line,f"Style `{key}` does not exist")
+                        raise StyleError(self.where(),line,f"Style `{key}` does not exist")
         
         if not datapoints['id']:
             if '$' in datapoints["id"]: #state declaration is illegal here
-                IllegalCharError(self.index,line,'$', "IllegalCharError: State definition not allowed in id value")
+                IllegalCharError(self.where(),line,'$', "IllegalCharError: State definition not allowed in id value")
             datapoints['id'] = None
         
         method = ELEMENTS[type_] # grab the specific element type based on type index
         
-        current:Element = method(self.parent_stack[-1].id,style,datapoints['id'],**operands) # ah yes dictionary unpacking gotta love how useful that is
+        current:Element = method(self.parent_stack[-1].id,style,datapoints['id'],ids=self.ids,**operands) # ah yes dictionary unpacking gotta love how useful that is
+        current.style_record = self.compile_style(style,line)
+        self.bind_states(current)
         self.parent_stack[-1].children.append(current)
         self.parent_stack.append(current)
         self.compiled[current.id] = current
@@ -685,19 +871,49 @@ class Compiler:
             self.frames[list(self.frames.keys())[-1]].append(current)
  
     ##############################################################
+
+    def bind_states(self, element:Element):
+        # records which states the element reads, so setting a state only re-renders what uses it
+        for _, name in element.style_record.states:
+            self.state_dependencies.setdefault(name,set()).add(element.id)
+        if element.type == 'text':
+            for text_line in element.text.split('\n'):
+                if text_line.startswith('$$'):
+                    self.state_dependencies.setdefault(text_line[2:],set()).add(element.id)
+
+    ##############################################################
+
+    def compile_style(self, style:dict[str,str], line:str) -> StyleRecord:
+        # Styles get parsed here once instead of on every render, and only once per distinct style
+        try:
+            key = tuple(style.items())
+            record = self.style_records.get(key)
+        except TypeError: # unhashable values from a styles file, those just don't get shared
+            key, record = None, None
+        if record is not None:
+            return record
+
+        record, invalid = build_style_record(style)
+        if invalid:
+            raise StyleError(self.where(),line,f"{invalid[0]} value {style[invalid[0]]} not valid")
+        if key is not None:
+            self.style_records[key] = record
+        return record
+
+    ##############################################################
         
         
     def handle_close_element(self,tokens:list[Token],line:str,syntax_type:str):
         if len(tokens) > 3:
-            return SyntaxIncorrect(self.index,line,f"CLOSE_ELEMENT argument does not take options")
+            return SyntaxIncorrect(self.where(),line,f"CLOSE_ELEMENT argument does not take options")
         
         type_ = tokens[2].value
 
         if type_ in RESERVED_NAMEVALUES: # Check to make sure the user isn't overwriting global or something
-            raise NameSpaceError(self.index,line,type_)
+            raise NameSpaceError(self.where(),line,type_)
 
         if self.parent_stack[-1].type != type_:
-            raise SyntaxIncorrect(self.index, line, f"CLOSE ELEMENT argument in wrong scope. Try checking if another element is still open during this call.")
+            raise SyntaxIncorrect(self.where(), line, f"CLOSE ELEMENT argument in wrong scope. Try checking if another element is still open during this call.")
         
         self.parent_stack.pop()
 
@@ -706,7 +922,7 @@ class Compiler:
     def handle_state(self,tokens:list[Token],line:str,syntax_type:str):
 
         if len(tokens) > 5:
-            return SyntaxIncorrect(self.index,line,f"CREATE_STATE argument does not take options")
+            return SyntaxIncorrect(self.where(),line,f"CREATE_STATE argument does not take options")
         
         name = tokens[2].value
         initial_value = tokens[4].value
@@ -722,13 +938,14 @@ class Compiler:
         if '$' in line: # handles if any state was found inside of a text element. If it is, it should overwrite the entire text element because I'm lazy
             
             if not line.startswith('$$'):
-                raise IllegalCharError(self.index,line,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
+                raise IllegalCharError(self.where(),line,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
             elif not line.count('$') == 2:
-                raise IllegalCharError(self.index,line,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
+                raise IllegalCharError(self.where(),line,'$',f"IllegalCharError: Symbol reserved for reactive state usage applied incorrectly")
             contains_state = False
 
             if line[2:] not in self.states.keys(): # make the error for this
-                raise StateImplementError(self.index,line,"State referenced which does not exist. States inside text objects must only exist on individual lines, did you try to put it in text?")
+                raise StateImplementError(self.where(),line,"State referenced which does not exist. States inside text objects must only exist on individual lines, did you try to put it in text?")
+            self.state_dependencies.setdefault(line[2:],set()).add(self.parent_stack[-1].id)
 
         if self.parent_stack[-1].text: # make the error for this
             self.parent_stack[-1].text +=  '\n'
@@ -736,4 +953,44 @@ class Compiler:
         # i want it to add the line regardless, as it will get compiled in the element, most of this function is for checking state errors
         self.parent_stack[-1].text +=  line 
 
+    ##############################################################
+
+    def to_document(self) -> dict:
+        """Flattens the compiled tree, frames, states and scoped styles into plain data for the cache"""
+        elements = []
+        stack = self.global_scope.children[::-1]
+        while stack: # pre-order, so every parent is rebuilt before its children
+            element = stack.pop()
+            extras = {key:getattr(element,key) for key in element.required}
+            elements.append((element.type, element.id, element.parent_id, element.style, dict(element.scoped_styles), extras))
+            stack.extend(element.children[::-1])
+
+        return {
+            "global_scoped":dict(self.global_scope.scoped_styles),
+            "elements":elements,
+            "frames":{frame:[element.id for element in self.frames[frame]] for frame in self.frames},
+            "states":{name:self.states[name].value for name in self.states},
+        }
+
+    def from_document(self, document:dict, dependencies:dict[str,str]=None):
+        """Rebuilds the compiled tree from the output of to_document. `dependencies` are the content hashes
+        of the files it was compiled from, kept so a Watcher knows every file to watch"""
+        if dependencies is not None:
+            self.dependencies = dict(dependencies)
+        self.global_scope.scoped_styles = document["global_scoped"]
+        for name, value in document["states"].items():
+            self.states[name] = State(name,value)
+
+        for type_, id_, parent_id, style, scoped_styles, extras in document["elements"]:
+            current:Element = ELEMENTS[type_](parent_id,style,id_,ids=self.ids,**extras)
+            current.style_record = self.compile_style(style,'')
+            if scoped_styles:
+                current.scoped_styles = scoped_styles
+            self.bind_states(current)
+            self.compiled[parent_id].children.append(current)
+            self.compiled[id_] = current
+
+        for frame, ids in document["frames"].items():
+            self.frames[frame] = [self.compiled[id_] for id_ in ids]
+
 # Todo. Add rendering (don't forget to compile reactive state at that time)
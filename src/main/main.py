@@ -1,7 +1,16 @@
 from ..compiler import *
+from ..compiler.pmscript import parse_style_value, S_PERCENTAGE, S_STATE, DEFAULT_STYLES
 from ..utils.logging import LogLevel, log, reset_log
-import re
+from ..utils.cache import RotationCache, surface_bytes
+from ..utils.fonts import TEXT
+from ..utils.spatial import SpatialGrid
+from ..utils.stats import Stats
+from .watch import Watcher
+from .reconcile import reconcile
 from collections import deque
+import heapq
+from time import perf_counter, monotonic
+from contextlib import contextmanager
 import pygame as pg
 
 class View:
@@ -11,12 +20,16 @@ class View:
     surf: pg.Surface
     size: list[int,int]
     frames:dict[str,list[State]]
+    state_dependencies:dict[str,set[str]]
 
-    def __init__(self, elements:dict[str,Element], states:dict[str,State], size:list[int,int], frames:dict[str,list[State]]):
+    def __init__(self, elements:dict[str,Element], states:dict[str,State], size:list[int,int], frames:dict[str,list[State]], state_dependencies:dict[str,set[str]]=None, hidden_frames:list[str]=()):
         
         self.elements = elements
         self.states = states
         self.frames = frames
+        self.state_dependencies = state_dependencies if state_dependencies is not None else {}
+        for state in self.states.values():
+            state.subscribe(self.on_state_change)
         self.surf = pg.Surface(size,pg.SRCALPHA)
         self.surf.fill((0,0,0,255))
         self.width = size[0]
@@ -25,19 +38,344 @@ class View:
         # Both the total elements group and frames group will modify each other because they are just pointing
         # to the same object
 
-
+        self.auto_render = True # when False, state changes wait for flush(), e.g. once at the end of each game frame
+        self.batch_depth = 0
+        self.dirty:set[str] = set() # ids waiting to be re-rendered
+        self.dirty_queue:list[tuple[int,str]] = [] # same ids as a heap on tree order, so parents render first
+        self.layers:dict[str,pg.Surface] = {} # every frame is drawn into its own cached layer
+        self.dirty_layers:dict[str,list[pg.Rect]] = {} # frame id -> screen areas of it that changed
+        self.dirty_rects:list[pg.Rect] = [] # areas of self.surf that changed since the last pop_dirty_rects
+        self.restack:list[pg.Rect] = [] # areas to restack although no layer changed there, e.g. after hiding a frame
+        # Hidden frames are not laid out, rasterized or drawn. Whatever gets dirty in them waits in pending
+        # until they are shown, so a frame that was never shown was never built at all
+        self.hidden:set[str] = set(hidden_frames)
+        self.hidden_since:dict[str,float] = {frame:monotonic() for frame in hidden_frames}
+        self.pending:dict[str,set[str]] = {}
+        self.frame_budget:int|None = None # bytes of surfaces that built frames may hold, see set_frame_budget
+        self.rotation_cache = RotationCache(maxsize=256)
+        self.hit_index = SpatialGrid() # surf_rect of every drawn element, for getElementsAtPoint
+        self.text_cache = TEXT # shared with everything else that draws text
+        self.font_file = None # None is the pygame default font
+        self.sysfont = False
+        self.render_stats = Stats() # phase timings, one frame per render pass
+        self.compile_stats:Stats = None # set by initialize, from the Compiler that built the view
+        self.watcher = None # set by initialize(watch=True), call self.watcher.poll() once a frame
+        self.index_elements()
         self.render_down_scope('global')
 
 
+    def index_elements(self):
+        """Records the tree (pre-)order of every element, which is both the render and the draw order"""
+        self.order:dict[str,int] = {'global':0}
+        self.frame_of:dict[str,str] = {} # element id -> id of the frame (layer) it is drawn in
+        self.frame_draw_order:dict[str,list[str]] = {}
+        for frame in self.elements['global'].children:
+            draw_order = self.frame_draw_order[frame.id] = []
+            stack = [frame]
+            while stack:
+                element = stack.pop()
+                self.order[element.id] = len(self.order)
+                self.frame_of[element.id] = frame.id
+                draw_order.append(element.id)
+                stack.extend(element.children[::-1])
+            if frame.id not in self.layers and frame.id not in self.dirty_layers: # layers are made on first draw
+                self.dirty_layers[frame.id] = [self.surf.get_rect()]
 
     def render_down_scope(self,id_:str):
         """Re-renders the object of the ID provided and all of it's children, 
         nothing else. Useful for only re-rendering a small scope"""
-        initial_object = self.elements[id_]
-        self.create_image_individual(initial_object)
-        self.create_image_individual(self.getElementById('welcome'))
-        # remove rendering in this function, this is meant to re-create images.
-        # Will need to make a function that is dedicated to turning on and off frames
+        stack = [self.elements[id_]]
+        while stack:
+            element = stack.pop()
+            self.mark_dirty(element.id)
+            stack.extend(element.children)
+        self.render()
+
+    def mark_dirty(self,id_:str):
+        """Schedules the element for the next render. Children that are sized off it get scheduled
+        by the render itself, but only if the element's size or rotation actually changed"""
+        if id_ not in self.dirty:
+            self.dirty.add(id_)
+            heapq.heappush(self.dirty_queue,(self.order[id_],id_))
+
+    def render(self):
+        """Re-renders every dirty element, then redraws the view from the cached surfaces"""
+        if not self.dirty and not self.restack:
+            return
+        while self.dirty_queue:
+            _, id_ = heapq.heappop(self.dirty_queue)
+            self.dirty.discard(id_)
+            frame = self.frame_of.get(id_)
+            if frame in self.hidden:
+                self.pending.setdefault(frame,set()).add(id_)
+                continue
+            element = self.elements[id_]
+
+            previous = element.computed_styles
+            previous_rect = element.surf_rect
+            self.create_image_individual(element)
+            self.render_stats.count('elements_rendered')
+            if id_ in self.frame_of: # both where it was and where it is now need redrawing
+                rects = self.dirty_layers.setdefault(self.frame_of[id_],[])
+                if previous_rect is not None:
+                    rects.append(previous_rect)
+                rects.append(element.surf_rect)
+                self.hit_index.insert(id_, element.surf_rect)
+            current = element.computed_styles
+            rotated = previous.get('rotation') != current['rotation']
+            if rotated or previous.get('width') != current['width'] or previous.get('height') != current['height']:
+                for child in element.children:
+                    if self.depends_on_parent(child, rotated):
+                        self.mark_dirty(child.id)
+        start = perf_counter()
+        self.composite()
+        self.render_stats.add('blit', perf_counter()-start)
+        self.render_stats.end_frame()
+
+    def on_state_change(self, state:State):
+        """Re-renders only the elements bound to the state"""
+        for id_ in self.state_dependencies.get(state.name,()):
+            self.mark_dirty(id_)
+        if self.auto_render and not self.batch_depth:
+            self.render()
+
+    @contextmanager
+    def batch(self):
+        """Collects every state change made inside the with block into one render pass at the end of it.
+        Batches can be nested, only the outermost one renders"""
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.flush()
+
+    def flush(self):
+        """Renders everything that was changed since the last render, each element once and parents first"""
+        self.render()
+
+    ###############################################
+
+    def show_frame(self, frame:str):
+        """Shows a hidden frame. A frame shown for the first time (or after its surfaces were evicted) is
+        built now, otherwise only what changed in it while it was hidden is rendered again"""
+        if frame not in self.hidden:
+            return
+        self.hidden.discard(frame)
+        self.hidden_since.pop(frame, None)
+        for id_ in self.pending.pop(frame, ()):
+            if self.frame_of.get(id_) == frame:
+                self.mark_dirty(id_)
+        self.restack.append(self.surf.get_rect())
+        if self.auto_render and not self.batch_depth:
+            self.render()
+        self.enforce_frame_budget()
+
+    def hide_frame(self, frame:str):
+        """Hides a frame. Its surfaces stay cached so showing it again is instant, unless the frame budget runs out"""
+        if frame in self.hidden or frame not in self.frame_draw_order:
+            return
+        self.hidden.add(frame)
+        self.hidden_since[frame] = monotonic()
+        self.restack.append(self.surf.get_rect())
+        if self.auto_render and not self.batch_depth:
+            self.render()
+        self.enforce_frame_budget()
+
+    def is_frame_visible(self, frame:str) -> bool:
+        return frame in self.frame_draw_order and frame not in self.hidden
+
+    def set_frame_budget(self, max_bytes:int|None):
+        """Caps the surface memory of built frames. Past it the surfaces of the frames hidden the longest are
+        dropped, and those frames are built again when next shown. None turns the cap off"""
+        self.frame_budget = max_bytes
+        self.enforce_frame_budget()
+
+    def frame_bytes(self, frame:str) -> int:
+        # only what evicting the frame frees: its layer and the rasters its elements drew themselves.
+        # Text surfaces belong to the shared text cache and rotated copies to the rotation cache
+        total = surface_bytes(self.layers[frame]) if frame in self.layers else 0
+        for id_ in self.frame_draw_order[frame]:
+            element = self.elements[id_]
+            if element.raster is not None and element.type != 'text':
+                total += surface_bytes(element.raster)
+        return total
+
+    def enforce_frame_budget(self):
+        if self.frame_budget is None:
+            return
+        sizes = {frame:self.frame_bytes(frame) for frame in self.frame_draw_order}
+        total = sum(sizes.values())
+        for frame in sorted(self.hidden, key=self.hidden_since.__getitem__):
+            if total <= self.frame_budget:
+                break
+            if sizes.get(frame):
+                total -= sizes[frame]
+                self.evict_frame(frame)
+
+    def evict_frame(self, frame:str):
+        # drops every surface of a hidden frame, and queues all of it to be built again on show
+        pending = self.pending.setdefault(frame,set())
+        for id_ in self.frame_draw_order[frame]:
+            element = self.elements[id_]
+            element.set_surface(None, None)
+            element.raster = None
+            element.raster_key = None
+            self.hit_index.remove(id_)
+            pending.add(id_)
+        self.layers.pop(frame, None)
+        self.dirty_layers[frame] = [self.surf.get_rect()]
+        self.render_stats.count('frames_evicted')
+
+    ###############################################
+
+    def reload(self, compiler:Compiler):
+        """Swaps in a recompiled (or entirely different) document, see swap_document"""
+        self.swap_document(compiler.compiled, compiler.states, compiler.frames, compiler.state_dependencies)
+        self.compile_stats = compiler.stats
+
+    def swap_document(self, elements:dict[str,Element], states:dict[str,State], frames:dict[str,list[Element]], state_dependencies:dict[str,set[str]]):
+        """Shows another compiled tree, e.g. a language or layout variant. The trees are reconciled by id and type:
+        unchanged elements keep their Element and surfaces outright, and only changed ones are rendered again"""
+        old_elements = self.elements
+        old_frame_of = self.frame_of
+        old_draw_order = self.frame_draw_order
+        screen = self.surf.get_rect()
+
+        result = reconcile(old_elements, elements)
+        elements = result.elements
+        changed = set(result.changed)
+        for id_ in result.changed:
+            old = old_elements.get(id_)
+            if old is not None and elements[id_] is not old: # same id, other type
+                elements[id_].computed_styles = old.computed_styles # so children only follow if the size changed
+                result.removed.append(old)
+
+        # wherever an old element was drawn has to be redrawn without it
+        for old in result.removed:
+            if elements.get(old.id) is None:
+                self.hit_index.remove(old.id)
+            frame = old_frame_of.get(old.id)
+            if frame is not None and old.surf_rect is not None: # dropped frames are cleaned up below
+                self.dirty_layers.setdefault(frame,[]).append(old.surf_rect)
+
+        for name in list(self.states):
+            if name not in states:
+                self.states.pop(name).unsubscribe(self.on_state_change)
+        for name, state in states.items():
+            if name not in self.states: # existing states keep their live value
+                self.states[name] = state
+                state.subscribe(self.on_state_change)
+
+        self.elements = elements
+        self.frames = {frame:[elements[element.id] for element in members] for frame, members in frames.items()}
+        self.state_dependencies = state_dependencies
+        queued = [id_ for id_ in self.dirty if id_ in elements] # e.g. a swap inside a batch
+        self.dirty.clear()
+        self.dirty_queue.clear()
+        self.index_elements()
+
+        for frame in {*self.layers, *self.dirty_layers, *self.pending, *self.hidden}:
+            if frame not in self.frame_draw_order:
+                self.layers.pop(frame, None)
+                self.dirty_layers.pop(frame, None)
+                self.pending.pop(frame, None)
+                self.hidden.discard(frame)
+                self.hidden_since.pop(frame, None)
+        if not self.frame_draw_order:
+            self.surf.fill((0,0,0,255))
+            self.dirty_rects.append(screen)
+        if list(old_draw_order) != list(self.frame_draw_order): # frames were added, dropped or restacked
+            for frame in self.frame_draw_order:
+                self.dirty_layers.setdefault(frame,[]).append(screen)
+        for frame, draw_order in self.frame_draw_order.items():
+            # changed elements get redrawn where they were and where they are by the render. The rest only
+            # needs redrawing if it now stacks differently against the other untouched elements of its frame
+            if frame not in old_draw_order:
+                continue
+            kept = [id_ for id_ in draw_order if id_ not in changed]
+            kept_before = [id_ for id_ in old_draw_order[frame] if elements.get(id_) is old_elements[id_] and id_ not in changed]
+            if kept != kept_before:
+                first = next((i for i, (a, b) in enumerate(zip(kept, kept_before)) if a != b), min(len(kept), len(kept_before)))
+                self.dirty_layers.setdefault(frame,[]).extend(
+                    elements[id_].surf_rect for id_ in kept[first:] if elements[id_].surf_rect is not None)
+        for id_ in result.changed: # the render only redraws the frame an element is in now
+            element = elements[id_]
+            frame = old_frame_of.get(id_)
+            if element is old_elements.get(id_) and frame in self.frame_draw_order and frame != self.frame_of.get(id_) and element.surf_rect is not None:
+                self.dirty_layers.setdefault(frame,[]).append(element.surf_rect)
+
+        for id_ in queued + result.changed:
+            self.mark_dirty(id_)
+        if self.dirty:
+            self.render()
+        else:
+            self.composite()
+
+    def depends_on_parent(self, element:Element, rotated:bool) -> bool:
+        # absolute elements size and rotate off global, and a state bound position could be either.
+        # Every relative child turns with its parent, but only percentages (or states, which can hold one)
+        # follow its size
+        record = element.style_record
+        if record.static.get('position','relative') != 'relative' and not any(style == 'position' for style, _ in record.states):
+            return False
+        return rotated or bool(record.percentages) or bool(record.states)
+
+    def composite(self):
+        """Redraws the changed areas of the frame layers, then restacks the layers in those areas only"""
+        if not self.dirty_layers and not self.restack:
+            return
+        screen = self.surf.get_rect()
+        changed = self.restack
+        self.restack = []
+        for frame in list(self.dirty_layers):
+            if frame in self.hidden: # drawn once it is shown
+                continue
+            rects = self.merge_rects(self.dirty_layers.pop(frame), screen)
+            layer = self.layers.get(frame)
+            if layer is None:
+                layer = self.layers[frame] = pg.Surface([self.width,self.height],pg.SRCALPHA)
+                rects = [screen]
+            for rect in rects:
+                layer.set_clip(rect)
+                layer.fill((0,0,0,0))
+                for id_ in self.frame_draw_order[frame]:
+                    element = self.elements[id_]
+                    if element.surf is not None and element.surf_rect.colliderect(rect):
+                        layer.blit(element.surf,element.surf_rect)
+            layer.set_clip(None)
+            changed.extend(rects)
+
+        changed = self.merge_rects(changed, screen)
+        for rect in changed:
+            self.surf.set_clip(rect)
+            self.surf.fill((0,0,0,255))
+            for frame in self.frame_draw_order: # frames later in the document sit on top
+                if frame not in self.hidden and frame in self.layers:
+                    self.blit_to_surf(self.layers[frame],(0,0))
+        self.surf.set_clip(None)
+        self.dirty_rects.extend(changed)
+
+    def merge_rects(self, rects:list[pg.Rect], bounds:pg.Rect) -> list[pg.Rect]:
+        # clips to the view, drops empty and duplicate areas, and falls back to one bounding
+        # rect once there are so many that drawing them one by one would cost more
+        merged = []
+        for rect in rects:
+            rect = rect.clip(bounds)
+            if rect.width and rect.height and not any(other.contains(rect) for other in merged):
+                merged = [other for other in merged if not rect.contains(other)]
+                merged.append(rect)
+        if len(merged) > 8:
+            return [merged[0].unionall(merged[1:])]
+        return merged
+
+    def pop_dirty_rects(self) -> list[pg.Rect]:
+        """Returns the areas of self.surf that changed since the last call, for pygame.display.update.
+        An empty list means nothing needs presenting this frame"""
+        rects = self.dirty_rects
+        self.dirty_rects = []
+        return rects
     
 
     ###############################################
@@ -70,82 +408,56 @@ class View:
             gbsurf = pg.Surface([self.width,self.height],pg.SRCALPHA)
             element.set_surface(gbsurf,gbsurf.get_rect())
             return
-        buffer = {}
-        for style in STYLES.keys():
-            # This code is not meant to add to computed styles at all, rather to verify that all styles contain proper
-            # types, structure, and attributes
-            if style not in element.style: # grab default style instead of regular if not in element.style
-                val = STYLES[style]['default']
-                buffer[style] = val
-                continue
-            
-            else:
-                val:str = element.style[style].strip()
-            
-            acceptable_types = STYLES[style]['types']
-
-
-            # Whether in or out continue with regular parsing
-            not_chosen = 0
-            if "number" in acceptable_types :
-                try:
-                    buffer[style] = float(val)
-                except ValueError:
-                    not_chosen += 1
-            
-            if "percentage" in acceptable_types:
-                try:
-                    maximum = STYLES[style]['max']
-                    
-                    if maximum in ['parentwidth','parentheight']: # If it depends on parent get that
-                        
-                        if buffer['position'] == 'relative':
-                            parent = self.getElementById(element.parent_id) 
-                        else:
-                            parent = self.getElementById('global')
-
-                        if maximum == 'parentwidth':
-                            maximum = parent.computed_styles['width']
-
-                        elif maximum == 'parentheight':
-                            maximum = parent.computed_styles['height']
-                    
-                    buffer[style] = (float(val[:-1]) /100 ) * maximum
-                except ValueError:
-                    not_chosen += 1
-
-            if "rgbvalue" in acceptable_types: # rgb val
-                if len(re.findall("(\d+)",val)) != 3:
-                    not_chosen += 1
-                else:
-                    colour = tuple(map(int,re.findall("(\d+)",val)))
-                    buffer[style] = colour
-                    
-
-            
-            if "text" in acceptable_types:
-                if val not in STYLES[style]['accepted']:
-                    not_chosen += 1
-                else:
-                    buffer[style] = val
-                    
-
-            if not_chosen == len(acceptable_types):
-                log(f"{style} value {val} not valid",LogLevel.FATAL)
-            
-
+        stats = self.render_stats
+        start = perf_counter()
+        buffer = self.resolve_styles(element)
+        rasterize_start = perf_counter()
+        stats.add('style_resolve', rasterize_start-start)
 
         if element.type in ['div', 'frame']:
             self.create_div_image(element, buffer)
         
         elif element.type in ['image']:
-            ...
+            self.create_blank_image(element, buffer)
 
         elif element.type in ['text']:
-            ...
+            self.create_text_image(element, buffer)
+        stats.add('rasterize', perf_counter()-rasterize_start)
         
         self.common_image_creation(element,buffer)
 
+    ###############################################
+
+    def resolve_styles(self, element:Element) -> dict:
+        """Turns the element's compiled style record into final values for this render"""
+        record = element.style_record
+        buffer = {**DEFAULT_STYLES, **record.static}
+        percentages = record.percentages
+
+        if record.states: # states can hold anything, so they are the only values still parsed at render time
+            percentages = list(percentages)
+            for style, name in record.states:
+                parsed = parse_style_value(style, self.states[name].value)
+                if parsed is None or parsed[0] == S_STATE:
+                    log("%s value %s from state %s not valid",LogLevel.FATAL,style,self.states[name].value,name)
+                kind, value = parsed
+                if kind == S_PERCENTAGE:
+                    percentages.append((style, value))
+                else:
+                    buffer[style] = value
+
+        if percentages:
+            if buffer['position'] == 'relative':
+                parent = self.getElementById(element.parent_id) 
+            else:
+                parent = self.getElementById('global')
+            for style, fraction in percentages:
+                if STYLES[style]['max'] == 'parentwidth':
+                    buffer[style] = fraction * parent.computed_styles['width']
+                else:
+                    buffer[style] = fraction * parent.computed_styles['height']
+        return buffer
+
     ###############################################
     def common_image_creation(self,element:Element,buffer):
         # common - shared between all elements
@@ -165,15 +477,15 @@ class View:
             parent = self.getElementById(element.parent_id) 
         else:
             parent = self.getElementById('global')
-        surf = pg.transform.rotate(surf,parent.computed_styles['rotation']+buffer['rotation'])
+        start = perf_counter()
+        surf = self.rotation_cache.rotate(surf,parent.computed_styles['rotation']+buffer['rotation'])
+        self.render_stats.add('rotate', perf_counter()-start)
         surf_rect = surf.get_rect(center = (
             element.computed_styles['cx'],
             element.computed_styles['cy']
         ))
         # set the surface to the rotated version
         element.set_surface(surf,surf_rect)
-        self.blit_to_surf(surf,surf_rect)
-        print(element.computed_styles)
 
     ##################################################
 
@@ -182,9 +494,48 @@ class View:
 
     ###################################################
 
-    def create_div_image(self, element:DivElement, buffer):
-        print(buffer)
+    def create_blank_image(self, element:Element, buffer):
+        # stand-in until images and text draw something, keeps their size and position in the layout
+        raster_key = ('blank', buffer['width'], buffer['height'])
+        if element.raster_key != raster_key:
+            element.raster = pg.Surface([buffer['width'],buffer['height']],pg.SRCALPHA)
+            element.raster_key = raster_key
+        element.set_surface(element.raster, element.raster.get_rect())
+
+    ###################################################
+
+    def create_text_image(self, element:TextElement, buffer):
+        # lines holding only a state get swapped for the state's current value
+        lines = element.text.split('\n')
+        for i, line in enumerate(lines):
+            if line.startswith('$$') and line[2:] in self.states:
+                lines[i] = str(self.states[line[2:]].value)
+
+        surf = self.text_cache.render('\n'.join(lines),
+                                      (self.font_file, int(buffer['font-size']), self.sysfont),
+                                      buffer['color'],
+                                      int(buffer['width']))
+        # without a size of its own, the element takes the size of its text
+        if not buffer['width']:
+            buffer['width'] = surf.get_width()
+        if not buffer['height']:
+            buffer['height'] = surf.get_height()
+        element.raster = surf # the cached text surface is never drawn on, so it can be used as is
+        element.raster_key = None
+        element.set_surface(surf, surf.get_rect())
+
+    def set_font_file(self, file_path:str|None, sysfont:bool=False):
+        """Sets the font for every text element, a .ttf path or with sysfont the name of a system font"""
+        self.font_file = file_path
+        self.sysfont = sysfont
+        for element in self.elements.values():
+            if element.type == 'text':
+                self.mark_dirty(element.id)
+        self.render()
+
+    ###################################################
 
+    def create_div_image(self, element:DivElement, buffer):
         # border
         border_space = 0
         border_color = (0,0,0,0)
@@ -206,7 +557,13 @@ class View:
         element.computed_styles['background'] = background_color
         # misc move misc to common function
 
-        # surface images
+        # surface images. The unrotated image is kept and reused while it would come out the same,
+        # which also lets the rotation cache recognise it
+        raster_key = ('div', buffer['width'], buffer['height'], border_space, tuple(border_color), tuple(background_color), element.computed_styles['corner-radius'])
+        if element.raster_key == raster_key:
+            element.set_surface(element.raster, element.raster.get_rect())
+            return
+
         surf = pg.Surface([buffer['width'],buffer['height']],pg.SRCALPHA)
         if border:
             pg.draw.rect(surf,border_color,(0,0,buffer['width'],buffer['height']),border_radius=element.computed_styles['corner-radius'])
@@ -217,6 +574,8 @@ class View:
                       buffer['height']-(2*border_space)
                       )
                      )
+        element.raster = surf
+        element.raster_key = raster_key
         surf_rect = surf.get_rect()
         element.set_surface(surf, surf_rect)
         
@@ -227,10 +586,30 @@ class View:
     ###############################################
     ###############################################
 
+    def getElementsAtPoint(self,position:tuple[float,float]) -> list[Element]:
+        """Elements whose surface covers the point, top-most first"""
+        hits = self.hit_index.query_point(position[0],position[1])
+        if self.hidden:
+            hits = [id_ for id_ in hits if self.frame_of.get(id_) not in self.hidden]
+        hits.sort(key=self.order.__getitem__, reverse=True)
+        return [self.elements[id_] for id_ in hits]
+
+    def stats(self) -> dict:
+        """Snapshot of the render phase timings and histograms, the caches, and the compile that built the view"""
+        return {
+            'render':self.render_stats.snapshot(),
+            'compile':self.compile_stats.snapshot() if self.compile_stats is not None else None,
+            'caches':{
+                'rotation':self.rotation_cache.stats(),
+                'text':self.text_cache.stats(),
+                'fonts':self.text_cache.fonts.stats(),
+            },
+        }
+
     def getElementById(self,id_:str) -> Element:
         element = self.elements.get(id_,None)
         if element is None:
-            log(f"{id_} not found in getElementById function, returning None",LogLevel.WARNING)
+            log("%s not found in getElementById function, returning None",LogLevel.WARNING,id_)
 
         return element 
 
@@ -255,12 +634,18 @@ class View:
 # Pass Objects from compiler to View
 ####################################
 
-def initialize(path:str, size:list[int,int]) -> View:
-    # transfers finished objects from compiler to view
-    compiler = Compiler(path)
+def initialize(path:str, size:list[int,int], watch:bool=False, hidden_frames:list[str]=()) -> View:
+    # transfers finished objects from compiler to view. With watch, the view reloads itself when
+    # the document or anything it imports is edited, see src/main/watch.py. Frames in hidden_frames
+    # (e.g. popups) are not built until the first View.show_frame
+    compiler = Compiler(path, keep_fragments=watch) # a watcher recompiles against the fragments of this compile
     state_objects = compiler.states
     elements = compiler.compiled
     frames = compiler.frames
-    return View(elements=elements,states=state_objects, size=size, frames=frames)
+    view = View(elements=elements,states=state_objects, size=size, frames=frames, state_dependencies=compiler.state_dependencies, hidden_frames=hidden_frames)
+    view.compile_stats = compiler.stats
+    if watch:
+        view.watcher = Watcher(view, compiler)
+    return view
 
 
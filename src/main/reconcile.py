@@ -0,0 +1,55 @@
+from typing import NamedTuple
+from ..compiler import Element
+
+##################
+# Tree reconciliation
+##################
+
+# Matches the elements of a newly compiled tree against the tree a View is showing, by id and type.
+# A matched element keeps its Element object, and with it its surfaces. If nothing that affects how it draws
+# changed it is left alone, otherwise the compiled fields are copied onto it and it is queued for rendering,
+# where its cached unrotated image is still reused if only its placement changed.
+# Elements without an id of their own are matched on their generated one (div0, div1, ...), so inserting an
+# element shifts the matches of the later elements of its type. Elements that should survive edits cheaply
+# want an explicit id.
+
+COMPILED_FIELDS = ('parent_id', 'style', 'style_record', 'scoped_styles')
+
+
+class Reconciliation(NamedTuple):
+    elements:dict[str,Element] # the tree to show, in tree order
+    changed:list[str] # ids that have to be rendered again
+    removed:list[Element] # old elements that are not part of the new tree
+
+
+def same_element(old:Element, new:Element) -> bool:
+    # everything the element's own image and placement is made from. Scoped styles only feed
+    # the compile of its children, which are compared on their own
+    return (old.type == new.type and old.parent_id == new.parent_id and old.style == new.style
+            and all(getattr(old,key) == getattr(new,key) for key in new.required))
+
+
+def reconcile(old_elements:dict[str,Element], new_elements:dict[str,Element]) -> Reconciliation:
+    """Builds the tree to show out of new_elements, reusing every element of old_elements with the same id and type"""
+    elements:dict[str,Element] = {}
+    changed = []
+    for id_, new in new_elements.items():
+        old = old_elements.get(id_)
+        if old is None or old.type != new.type:
+            elements[id_] = new
+            changed.append(id_)
+            continue
+        elements[id_] = old
+        if not same_element(old, new):
+            for field in COMPILED_FIELDS:
+                setattr(old, field, getattr(new, field))
+            for key in new.required:
+                setattr(old, key, getattr(new, key))
+            changed.append(id_)
+
+    for id_, new in new_elements.items():
+        if new.children_allowed:
+            elements[id_].children = [elements[child.id] for child in new.children]
+
+    removed = [old for id_, old in old_elements.items() if elements.get(id_) is not old]
+    return Reconciliation(elements, changed, removed)
@@ -0,0 +1,72 @@
+import os
+import time
+from ..compiler import Compiler
+from ..compiler import cache
+from ..utils.logging import FatalError, LogLevel, log, recoverable
+
+##################
+# Hot reload
+##################
+
+# Watches a live View's document for edits. poll() is cheap enough to call every game frame: at most every
+# `interval` seconds it checks the modification times of the root document and every file it imported, and only
+# recompiles once one of them changed. Imports whose content is unchanged are replayed from the last compile's
+# fragments instead of going through the lexer again, and View.reload keeps every element that came out the same.
+# A document that no longer compiles is logged and the View keeps showing the last version that did.
+# (A View whose document was loaded from the cache has no fragments yet, so its first reload lexes everything)
+
+
+class Watcher:
+
+    def __init__(self, view, compiler:Compiler, interval:float=0.5, use_cache:bool=True, cache_dir:str=cache.CACHE_DIR):
+        self.view = view
+        self.compiler = compiler
+        self.path = compiler.path
+        self.interval = interval
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.next_poll = 0.0
+        self.mtimes = self.stat_files()
+
+    def files(self) -> list[str]:
+        return list(dict.fromkeys([self.path, *self.compiler.dependencies]))
+
+    def stat_files(self) -> dict[str,float|None]:
+        mtimes = {}
+        for path in self.files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError: # deleted or mid-save, either way it changed
+                mtimes[path] = None
+        return mtimes
+
+    def poll(self) -> bool:
+        """Reloads the view if any file of the document changed. Returns whether it did"""
+        now = time.monotonic()
+        if now < self.next_poll:
+            return False
+        self.next_poll = now + self.interval
+
+        mtimes = self.stat_files()
+        if mtimes == self.mtimes:
+            return False
+        self.mtimes = mtimes # a broken edit is not retried until the files change again
+        return self.reload()
+
+    def reload(self) -> bool:
+        """Recompiles the document and patches the view with it. Returns False if the document did not compile"""
+        start = time.perf_counter()
+        try:
+            with recoverable():
+                compiler = Compiler(self.path, self.use_cache, self.cache_dir, previous=self.compiler, keep_fragments=True)
+        except FatalError as error:
+            log("Reload of %s failed, keeping the last version: %s", LogLevel.ERROR, self.path, error.message.strip())
+            return False
+        except Exception as error: # e.g. a styles file caught mid-save, which must not take the game down
+            log("Reload of %s failed, keeping the last version: %s: %s", LogLevel.ERROR, self.path, type(error).__name__, error)
+            return False
+        self.compiler = compiler
+        self.mtimes = self.stat_files() # the edit may have added or dropped imports
+        self.view.reload(compiler)
+        log("Reloaded %s in %.1fms", LogLevel.SUCCESS, self.path, (time.perf_counter()-start)*1000)
+        return True
@@ -24,6 +24,9 @@ from typing import NewType
 from typing import Any
 from copy import deepcopy
 import os
+from .utils.fonts import TEXT
+from .utils.spatial import SpatialGrid
+from .utils.ids import IdAllocator
 
 # default color declarations just since it is a library
 BLACK = (0,0,0)
@@ -55,7 +58,10 @@ class Window:
         __gridhandler
         mouseInteraction
         keyboardInteraction
+        __set_focus
         update_surf
+        __render_order
+        __linked_from
         update_stat
         return_state
         save_frame
@@ -70,13 +76,16 @@ class Window:
         self._default_font_file = os.path.join(f"{os.getcwd()}","gameFont.ttf")
         self._placeholder_file = os.path.join(f"{os.getcwd()}","Placeholder.png")
         self.sysfont = False
+        self._ids = IdAllocator() # object IDs are unique per Window, not per process
         self.__width = width
         self.__height = height
         self.__surf = pg.Surface([self.__width, self.__height],pg.SRCALPHA)
         self.__surf.fill((0,0,0,0))
 
         self.__collidables: dict[objectID, pg.Rect] = {}
+        self.__index = SpatialGrid() # the same rects as __collidables, filed by screen area for hit testing
         self._objects: dict[objectID, __Object] = {}
+        self.__focused: objectID = None # the textbox keystrokes go to, if any
         self.__frames: dict[objectID, Any] = {}
         
         self.__links: dict[objectID, dict[str, list[objectID]]] = {}
@@ -95,6 +104,11 @@ class Window:
             None
         """
         if linked_id == None: return
+        if linked_id in self.__links[ID]["backward"] or linked_id in self.__links[ID]["forward"]: return
+
+        # updating ID updates linked_id, so if linked_id already leads back to ID the link would loop forever
+        if linked_id == ID or ID in self.__linked_from(linked_id):
+            raise Exception(f"Link from {ID} to {linked_id} would create a render cycle")
 
         if backward:
             self.__links[ID]["backward"].append(linked_id)
@@ -120,6 +134,8 @@ class Window:
         else:
             if ID is None: # add a identity creation func
                 ID = _create_id(object)
+            else:
+                self._ids.claim(ID)
             object: __Object = object
 
             self._objects[ID] = object
@@ -133,7 +149,10 @@ class Window:
             else: # otherwise use the rect of the image
                 self.__collidables[ID] = object._image.get_rect()
                 self.__collidables[ID].topleft = position
+            self.__index.insert(ID, self.__collidables[ID])
             self.__links[ID] = {"forward":[], "backward":[]}
+            if object.type == "textbox" and object.activated:
+                self.__set_focus(ID, render=False)
             self.update_surf(ID)
     
     
@@ -202,19 +221,14 @@ class Window:
         Returns:
             None
         """
-        for ID in self.__collidables:
+        hits = self.__index.query_point(position[0],position[1])
+        if self.__focused is not None and self.__focused not in hits:
+            self.__set_focus(None)
+
+        for ID in hits:
             object = self._objects[ID]
-            collidable = self.__collidables[ID]
             
             if object.type == "label": continue
-
-            if not collidable.collidepoint(position[0],position[1]):
-
-                if object.type == "textbox": 
-                    object.activated = False
-                    self.update_surf(ID)
-
-                continue
             
             if object.type == "func":
                 ret = self._objects[ID]._func(*self._objects[ID]._args)
@@ -223,11 +237,30 @@ class Window:
             elif object.type == "val":
                 self._objects[ID].activated = True if not self._objects[ID].activated else False
             elif object.type == "textbox":
-                self._objects[ID].activated = True
+                self.__set_focus(ID, render=False)
                 self._objects[ID].cursor_pos = len(object.text)-1
             self.update_surf(ID)
 
-            
+    def __set_focus(self, ID, render:bool=True):
+        """
+        self.__set_focus(ID, render) -> None
+        Private method which moves keyboard focus to the textbox ID, or clears it if ID is None. Only the textbox losing focus and, if render, the one gaining it are re-rendered\n
+        Arguments:
+            ID: Unique string identifier of a textbox on the current Frame, or None
+            render: boolean to re-render the newly focused textbox; False when the caller renders it anyway
+        Returns:
+            None
+        """
+        previous = self.__focused
+        self.__focused = ID
+        if previous is not None and previous != ID and previous in self._objects:
+            self._objects[previous].activated = False
+            self.update_surf(previous)
+        if ID is not None:
+            self._objects[ID].activated = True
+            if render and previous != ID:
+                self.update_surf(ID)
+
 
     def keyboardInteraction(self, key):
         """
@@ -246,35 +279,36 @@ class Window:
             None
         """
 
-        for ID in self._objects:
-            object = self._objects[ID]
-            if object.type != "textbox": continue
-            if not object.activated: continue
-
-            new_text = object.text[:object.cursor_pos+1] + key + object.text[object.cursor_pos+1:]
-            if key == "\x08":
-                if len(object.text) != 0:
-                    self._objects[ID].text = object.text[:object.cursor_pos] + object.text[object.cursor_pos+1:]
-                    self._objects[ID].cursor_pos -= 1
-            elif key == "\r":
-                self._objects[ID].activated = False
-            elif key == "lspr":
+        # only the focused textbox takes keystrokes
+        ID = self.__focused
+        if ID is None: return
+        object = self._objects[ID]
+
+        new_text = object.text[:object.cursor_pos+1] + key + object.text[object.cursor_pos+1:]
+        if key == "\x08":
+            if len(object.text) != 0:
+                self._objects[ID].text = object.text[:object.cursor_pos] + object.text[object.cursor_pos+1:]
                 self._objects[ID].cursor_pos -= 1
-                if self._objects[ID].cursor_pos != 0:
-                    self._objects[ID].cursor_pos %= len(object.text)
-            elif key == "rspr":
-                self._objects[ID].cursor_pos += 1
-                if self._objects[ID].cursor_pos != 0:
-                    self._objects[ID].cursor_pos %= len(object.text)
-            elif object.input_type == "num" and key in "1234567890":
-                
-                self._objects[ID].text = new_text
-                self._objects[ID].cursor_pos += len(key)
-            elif object.input_type == "all":
-
-                self._objects[ID].text = new_text
-                self._objects[ID].cursor_pos += len(key)
-            self.update_surf(ID)
+        elif key == "\r":
+            self._objects[ID].activated = False
+            self.__focused = None
+        elif key == "lspr":
+            self._objects[ID].cursor_pos -= 1
+            if self._objects[ID].cursor_pos != 0:
+                self._objects[ID].cursor_pos %= len(object.text)
+        elif key == "rspr":
+            self._objects[ID].cursor_pos += 1
+            if self._objects[ID].cursor_pos != 0:
+                self._objects[ID].cursor_pos %= len(object.text)
+        elif object.input_type == "num" and key in "1234567890":
+            
+            self._objects[ID].text = new_text
+            self._objects[ID].cursor_pos += len(key)
+        elif object.input_type == "all":
+
+            self._objects[ID].text = new_text
+            self._objects[ID].cursor_pos += len(key)
+        self.update_surf(ID)
 
     def update_surf(self, ID,bg_color:int=(0,0,0,0), update_bg:bool=True):
         """
@@ -288,20 +322,62 @@ class Window:
             None
         """
         collidable = self.__collidables[ID]
-        orig_coords = collidable.topleft
         if update_bg:
             pg.draw.rect(self.__surf, bg_color, collidable)
-        self._objects[ID].render()
-        self.__collidables[ID] = self._objects[ID]._image.get_rect()
-        self.__collidables[ID].topleft = orig_coords
 
-        for linked_ID in self.__links[ID]["backward"]: #update backward linked ids
-            self.update_surf(linked_ID, update_bg=False)
+        # every linked object renders once, backward links before the object that links them and forward links after
+        for linked_ID in self.__render_order(ID):
+            collidable = self.__collidables[linked_ID]
+            orig_coords = collidable.topleft
+            self._objects[linked_ID].render()
+            self.__collidables[linked_ID] = self._objects[linked_ID]._image.get_rect()
+            self.__collidables[linked_ID].topleft = orig_coords
+            self.__index.insert(linked_ID, self.__collidables[linked_ID])
+            self.__surf.blit(self._objects[linked_ID]._image,collidable)
 
-        self.__surf.blit(self._objects[ID]._image,collidable)
-
-        for linked_ID in self.__links[ID]["forward"]: #update forward linked ids
-            self.update_surf(linked_ID, update_bg=False)
+    def __render_order(self, ID) -> list[objectID]:
+        """
+        self.__render_order(ID) -> list[objectID]
+        Private method which resolves the render links of ID into a deduplicated draw order\n
+        Arguments:
+            ID: Unique string identifier of an Object on the current Frame
+        Returns:
+            list of object IDs, each once, in the order they should render
+        """
+        order = []
+        visited = set()
+        stack = [(False, ID)] # (emit, ID); popped in reverse, so pushes go forward links, self, backward links
+        while stack:
+            emit, current = stack.pop()
+            if emit:
+                order.append(current)
+                continue
+            if current in visited: continue
+            visited.add(current)
+            links = self.__links[current]
+            stack.extend((False, linked_ID) for linked_ID in reversed(links["forward"]))
+            stack.append((True, current))
+            stack.extend((False, linked_ID) for linked_ID in reversed(links["backward"]))
+        return order
+
+    def __linked_from(self, ID) -> set[objectID]:
+        """
+        self.__linked_from(ID) -> set[objectID]
+        Private method which finds every object an update of ID would also update\n
+        Arguments:
+            ID: Unique string identifier of an Object on the current Frame
+        Returns:
+            set of object IDs
+        """
+        reached = set()
+        stack = [ID]
+        while stack:
+            links = self.__links.get(stack.pop(), {"forward":[], "backward":[]})
+            for linked_ID in links["backward"] + links["forward"]:
+                if linked_ID not in reached:
+                    reached.add(linked_ID)
+                    stack.append(linked_ID)
+        return reached
     
 
     def update_stat(self,ID,activated:bool=None,text:str=None, command=None, args:tuple[Any]=None, image_path:str=None):
@@ -319,6 +395,11 @@ class Window:
             None
         """
         if activated is not None:
+            if self._objects[ID].type == "textbox": # keep the keyboard focus in line with the textbox
+                if activated:
+                    self.__set_focus(ID, render=False)
+                elif self.__focused == ID:
+                    self.__focused = None
             self._objects[ID].activated = activated
         if text is not None:
             self._objects[ID].text = text
@@ -363,9 +444,11 @@ class Window:
 
         self.__frames[ID] = { # if inheritance issues show up just put copies on everything
             "collidables" : self.__collidables, #{x:self.__collidables[x] for x in self.__collidables}, 
+            "index" : self.__index,
             "objects" : self._objects, #{x:self._objects[x] for x in self._objects},
             "surface": self.__surf,
-            "links": self.__links
+            "links": self.__links,
+            "focused": self.__focused
         }
         if flush:
             self.flush()
@@ -395,9 +478,11 @@ class Window:
             raise Exception(f"No frame ID {ID} exists")
         frame = self.__frames[ID]
         self.__collidables = frame['collidables']
+        self.__index = frame['index']
         self._objects = frame['objects']
         self.__surf = frame['surface']
         self.__links = frame['links']
+        self.__focused = frame['focused']
         return False
 
 
@@ -413,7 +498,9 @@ class Window:
 
         self.__links = {}
         self.__collidables = {}
+        self.__index = SpatialGrid()
         self._objects = {}
+        self.__focused = None
 
 
     def surface(self):
@@ -565,39 +652,26 @@ def _create_multiline_text(window:Window, text:str, padding=10, size=20, width=1
         padding: padding in pixels afforded to each edge of the text
         color: the RGB color value of the text
     Returns:
-        pygame.surface() object
+        pygame.surface() object; shared through the text cache, so blit it but never draw onto it
     """
 
-    # this won't run very much so the overhead can be greater
+    # fonts and rendered text both come from the shared pools, so repeated labels are never re-rasterized
     if font_file is None:
         font_file = window._default_font_file
-    if sysfont:
-        font = pg.font.SysFont(font_file,size)
-    else:
-        font = pg.font.Font(font_file,size=size)
     if width == -1:
         width = padding//2
-    surf = font.render(text,True, color, wraplength=width- padding//2)
-    surf.convert_alpha()
-    return surf
+    return TEXT.render(text, (font_file, size, sysfont), color, wraplength=width- padding//2)
 
-__past_ids = []
 def _create_id(object:__Object) -> objectID:
     """
     _create_id(object) -> objectID:str
-    Creates a unique object identifier\n
+    Creates an object identifier unique within the object's Window\n
     Arguments:
         object: object inherited from __Object class
     Returns:
         objectID:str
     """
-    id_suffix = 0
-    object_type = str(object)
-
-    while (id := object_type+str(id_suffix)) in __past_ids: 
-        id_suffix += 1
-    __past_ids.append(id)
-    return id
+    return object.window._ids.create(str(object))
         
 
 # define custom types
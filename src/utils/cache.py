@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import pygame as pg
+
+
+class LRUCache:
+    # Bounded least recently used cache. Keeps at most `maxsize` entries, and if a weigher is given, at most
+    # `maxweight` total weight (e.g. bytes of surface memory). hits and misses are counted so it can be sized
+
+    def __init__(self, maxsize:int=256, maxweight:int=None, weigher=None):
+        self.maxsize = maxsize
+        self.maxweight = maxweight
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries:OrderedDict = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.discard(key)
+        self.entries[key] = value
+        if self.weigher is not None:
+            self.weight += self.weigher(value)
+        self.evict()
+
+    def discard(self, key):
+        value = self.entries.pop(key, None)
+        if value is not None and self.weigher is not None:
+            self.weight -= self.weigher(value)
+
+    def evict(self):
+        while self.entries and (len(self.entries) > self.maxsize or
+                                (self.maxweight is not None and self.weight > self.maxweight)):
+            _, value = self.entries.popitem(last=False)
+            if self.weigher is not None:
+                self.weight -= self.weigher(value)
+
+    def clear(self):
+        self.entries.clear()
+        self.weight = 0
+
+    def stats(self) -> dict:
+        return {'hits':self.hits, 'misses':self.misses, 'size':len(self.entries), 'weight':self.weight}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def surface_bytes(surf:pg.Surface) -> int:
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+
+class RotationCache(LRUCache):
+    # Rotated copies of surfaces, keyed by the identity of the source surface and the angle.
+    # The source is kept in the entry so its id can't be reused by another surface while cached
+
+    def __init__(self, maxsize:int=256, maxweight:int=None):
+        super().__init__(maxsize, maxweight, lambda entry: surface_bytes(entry[1]))
+        self.unrotated = 0 # calls that took the zero rotation fast path
+
+    def rotate(self, surf:pg.Surface, angle:float) -> pg.Surface:
+        angle %= 360
+        if angle == 0:
+            self.unrotated += 1
+            return surf
+        key = (id(surf), angle)
+        entry = self.get(key)
+        if entry is not None and entry[0] is surf:
+            return entry[1]
+        rotated = pg.transform.rotate(surf, angle)
+        self.put(key, (surf, rotated))
+        return rotated
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats['unrotated'] = self.unrotated
+        return stats
@@ -0,0 +1,54 @@
+import pygame as pg
+from .cache import LRUCache, surface_bytes
+
+##################
+# Fonts and text
+##################
+
+# Loading a font parses the whole font file, and rasterizing text is not much cheaper, so both are pooled here
+# and shared by everything that draws text. Font keys are (file, size, sysfont), where file None is the pygame
+# default font.
+
+
+class FontPool(LRUCache):
+    # Capped by count on purpose: pygame does not say how much memory an open Font holds, and a document only
+    # uses a handful of (file, size) pairs, so the cap is there to stop a stray loop over sizes, not to budget memory.
+    # Its size and hit counters are reported by View.stats() next to the text cache
+
+    def __init__(self, maxsize:int=32):
+        super().__init__(maxsize)
+
+    def get_font(self, file:str|None, size:int, sysfont:bool=False) -> pg.font.Font:
+        key = (file, size, sysfont)
+        font = self.get(key)
+        if font is None:
+            if not pg.font.get_init():
+                pg.font.init()
+            if sysfont:
+                font = pg.font.SysFont(file,size)
+            else:
+                font = pg.font.Font(file,size=size)
+            self.put(key, font)
+        return font
+
+
+class TextCache(LRUCache):
+    # Rendered text surfaces keyed by (text, font key, colour, wrap width). Capped by surface memory.
+    # The surfaces are shared between everyone asking for the same text, so they must never be drawn on
+
+    def __init__(self, maxsize:int=1024, maxweight:int=16*1024*1024, fonts:FontPool=None):
+        super().__init__(maxsize, maxweight, surface_bytes)
+        self.fonts = fonts if fonts is not None else FONTS
+
+    def render(self, text:str, font_key:tuple[str|None,int,bool], color:tuple[int], wraplength:int=0, antialias:bool=True) -> pg.Surface:
+        key = (text, font_key, tuple(color), wraplength, antialias)
+        surf = self.get(key)
+        if surf is None:
+            font = self.fonts.get_font(*font_key)
+            surf = font.render(text, antialias, color, wraplength=wraplength)
+            self.put(key, surf)
+        return surf
+
+
+FONTS = FontPool()
+TEXT = TextCache(fonts=FONTS)
@@ -0,0 +1,25 @@
+class IdAllocator:
+    # Hands out unique ids like `div0`, `div1` in amortized O(1), with a counter per prefix and a set of
+    # every id taken. Each Compiler or Window owns one, so ids from one document never collide with another's
+
+    def __init__(self):
+        self.used:set[str] = set()
+        self.counters:dict[str,int] = {}
+
+    def create(self, prefix:str) -> str:
+        suffix = self.counters.get(prefix, 0)
+        while (id_ := prefix+str(suffix)) in self.used: # only loops past ids that were claimed by hand
+            suffix += 1
+        self.counters[prefix] = suffix + 1
+        self.used.add(id_)
+        return id_
+
+    def claim(self, id_:str) -> bool:
+        """Takes an id given by the user. Returns False if it was already taken"""
+        if id_ in self.used:
+            return False
+        self.used.add(id_)
+        return True
+
+    def __contains__(self, id_:str) -> bool:
+        return id_ in self.used
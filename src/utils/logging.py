@@ -1,22 +1,126 @@
+import atexit
+import contextlib
 import datetime
+import os
+import threading
+import time
 
 class LogLevel:
-    # LEVEL = [TAG, COLOR, SHOULD TERMINATE]
-    INFO = ["INFO", "", False]
-    SUCCESS = ["SUCCESS", "\033[1;34m", False]
-    WARNING = ["WARNING", "\033[1;33m", False]
-    ERROR = ["ERROR", "\033[1;31m", False]
-    FATAL = ["FATAL", "\033[1;31m", True]
-
-def log(message: str, level: LogLevel) -> None:
-    with open("./log.txt", "a") as f:
-        f.write(f"{datetime.datetime.now()} [{level[0]}] {message}\n")
-        print(f"{level[1]}{datetime.datetime.now()} [{level[0]}] {message}\033[0m")
-        if level[2]:
-            f.write("Exiting due to fatal error\n")
+    # LEVEL = [TAG, COLOR, SHOULD TERMINATE, SEVERITY]
+    INFO = ["INFO", "", False, 10]
+    SUCCESS = ["SUCCESS", "\033[1;34m", False, 20]
+    WARNING = ["WARNING", "\033[1;33m", False, 30]
+    ERROR = ["ERROR", "\033[1;31m", False, 40]
+    FATAL = ["FATAL", "\033[1;31m", True, 50]
+
+class FatalError(SystemExit):
+    # Raised by a FATAL log. Still exits the program with code 1 like before,
+    # but code that compiles on behalf of others (batch compiles) can catch it and keep the message
+    def __init__(self, message: str):
+        super().__init__(1)
+        self.message = message
+
+# Messages are kept in memory and written out by a background thread every FLUSH_INTERVAL seconds,
+# at exit, and straight away on FATAL, so logging never opens the log file on the caller's thread.
+# Levels below the minimum return before doing any work at all, which keeps disabled logs cheap in the render loop.
+
+FLUSH_INTERVAL = 1.0
+
+_min_severity = LogLevel.INFO[3]
+_log_file = "./log.txt"
+_console = True
+_buffer: list[str] = []
+_lock = threading.Lock()
+_flusher: threading.Thread = None
+_recovering = threading.local()
+
+def set_log_level(level: LogLevel) -> None:
+    """Drops every message below level. FATAL messages are never dropped"""
+    global _min_severity
+    _min_severity = min(level[3], LogLevel.FATAL[3])
+
+def set_log_file(path: str) -> None:
+    global _log_file
+    flush_log()
+    _log_file = path
+
+def set_console(enabled: bool) -> None:
+    """Turns printing messages to the console on or off, the log file still gets them"""
+    global _console
+    _console = enabled
+
+@contextlib.contextmanager
+def recoverable():
+    """FATAL logs in this block still raise FatalError, but the caller catches it and keeps running,
+    so they are not announced as exiting the program"""
+    depth = getattr(_recovering, "depth", 0)
+    _recovering.depth = depth + 1
+    try:
+        yield
+    finally:
+        _recovering.depth = depth
+
+def log(message, level: LogLevel, *args) -> None:
+    # message is only formatted if the level is enabled: either `message % args`, or message() if it is callable
+    if level[3] < _min_severity:
+        return
+    if callable(message):
+        message = message()
+    elif args:
+        message = message % args
+
+    line = f"{datetime.datetime.now()} [{level[0]}] {message}"
+    exiting = level[2] and not getattr(_recovering, "depth", 0)
+    with _lock:
+        _buffer.append(line)
+        if exiting:
+            _buffer.append("Exiting due to fatal error")
+    if _console:
+        print(f"{level[1]}{line}\033[0m")
+        if exiting:
             print("\033[1;31mExiting due to fatal error\033[0m")
-            exit(1)
+
+    if level[2]:
+        flush_log()
+        raise FatalError(message)
+    _start_flusher()
+
+def flush_log() -> None:
+    """Writes every buffered message to the log file"""
+    with _lock:
+        if not _buffer:
+            return
+        lines = "\n".join(_buffer) + "\n"
+        _buffer.clear()
+        with open(_log_file, "a") as f:
+            f.write(lines)
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush_log()
+
+def _start_flusher() -> None:
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_loop, name="pymenu-log-flush", daemon=True)
+        _flusher.start()
 
 def reset_log():
-    with open("./log.txt", "w") as f:
-        f.write("")
\ No newline at end of file
+    with _lock:
+        _buffer.clear()
+        with open(_log_file, "w") as f:
+            f.write("")
+
+def _after_fork() -> None:
+    # a forked child (batch compile workers) gets neither the thread nor a usable lock, so it starts its own.
+    # It also drops the copy of the buffer, those lines are the parent's to write
+    global _flusher, _lock
+    _flusher = None
+    _lock = threading.Lock()
+    with _lock:
+        _buffer.clear()
+
+atexit.register(flush_log)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
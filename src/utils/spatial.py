@@ -0,0 +1,78 @@
+import pygame as pg
+
+
+class SpatialGrid:
+    # Uniform grid over screen space for hit testing. Every key is filed under each cell its rect touches,
+    # so a point query only checks the few rects sharing the point's cell instead of every rect there is.
+    # Keys are returned in the order they were first inserted, which is the order callers iterated before
+
+    def __init__(self, cell_size:int=64):
+        self.cell_size = cell_size
+        self.rects:dict = {}
+        self.cells:dict[tuple[int,int],set] = {}
+        self.sequence:dict = {}
+        self.counter = 0 # only ever grows, so a removed key's number is never handed out again
+
+    def _cells(self, rect:pg.Rect):
+        size = self.cell_size
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                yield (x, y)
+
+    def insert(self, key, rect:pg.Rect):
+        """Adds the key, or moves it if it is already in the grid"""
+        if key in self.rects:
+            if self.rects[key] == rect:
+                return
+            self.remove(key, keep_order=True)
+        rect = pg.Rect(rect)
+        self.rects[key] = rect
+        if key not in self.sequence:
+            self.sequence[key] = self.counter
+            self.counter += 1
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key, keep_order:bool=False):
+        rect = self.rects.pop(key, None)
+        if rect is None:
+            return
+        for cell in self._cells(rect):
+            keys = self.cells.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.cells[cell]
+        if not keep_order:
+            self.sequence.pop(key, None)
+
+    def query_point(self, x:float, y:float) -> list:
+        """Keys whose rect contains the point, in insertion order"""
+        keys = self.cells.get((int(x // self.cell_size), int(y // self.cell_size)))
+        if not keys:
+            return []
+        hits = [key for key in keys if self.rects[key].collidepoint(x, y)]
+        hits.sort(key=self.sequence.__getitem__)
+        return hits
+
+    def query_rect(self, rect:pg.Rect) -> list:
+        """Keys whose rect overlaps the rect, in insertion order"""
+        rect = pg.Rect(rect)
+        found = set()
+        for cell in self._cells(rect):
+            found.update(self.cells.get(cell, ()))
+        hits = [key for key in found if self.rects[key].colliderect(rect)]
+        hits.sort(key=self.sequence.__getitem__)
+        return hits
+
+    def clear(self):
+        self.rects.clear()
+        self.cells.clear()
+        self.sequence.clear()
+        self.counter = 0
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def __len__(self):
+        return len(self.rects)
@@ -0,0 +1,55 @@
+import math
+
+class Stats:
+    # Timers and counters for the phases of a compile or a render. Callers time a phase with
+    # time.perf_counter() and hand the seconds to add(), so a phase costs two clock reads and a few dict updates.
+    # end_frame() closes a frame (one render pass, or one compile) and files each phase's time for that frame
+    # into a histogram, so slow frames can be told apart from a slow average
+
+    BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, math.inf)
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.totals:dict[str,float] = {}
+        self.calls:dict[str,int] = {}
+        self.counters:dict[str,int] = {}
+        self.frame:dict[str,float] = {}
+        self.histograms:dict[str,list[int]] = {}
+        self.frames = 0
+
+    def add(self, phase:str, seconds:float):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.frame[phase] = self.frame.get(phase, 0.0) + seconds
+
+    def count(self, name:str, amount:int=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def end_frame(self):
+        for phase, seconds in self.frame.items():
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = [0] * len(self.BUCKETS_MS)
+            milliseconds = seconds * 1000
+            for i, bound in enumerate(self.BUCKETS_MS):
+                if milliseconds <= bound:
+                    histogram[i] += 1
+                    break
+        self.frame.clear()
+        self.frames += 1
+
+    def snapshot(self) -> dict:
+        """Plain data copy of everything recorded so far. Histogram keys are the upper bound of each bucket in ms"""
+        labels = [str(bound) for bound in self.BUCKETS_MS]
+        return {
+            'frames':self.frames,
+            'phases':{phase:{
+                'total_ms':self.totals[phase] * 1000,
+                'calls':self.calls[phase],
+                'mean_ms':self.totals[phase] * 1000 / self.calls[phase],
+            } for phase in self.totals},
+            'counters':dict(self.counters),
+            'histograms':{phase:dict(zip(labels, histogram)) for phase, histogram in self.histograms.items()},
+        }